@@ -0,0 +1,83 @@
+# python scripts/bench_ann.py [--rows 100000] [--nprobe 4,16,64] [--ef-search 32,64,128]
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(script_dir, '..'))  # make `src` importable when run from anywhere
+
+from src.ann import HnswIndex, IvfFlatIndex, hnswlib
+from src.retrieval import blocked_top_k, l2_normalize
+
+DIM = 384  # all-MiniLM-L6-v2
+TOP_K = 5
+
+
+def clustered_matrix(rows: int, rng: np.random.Generator, clusters: int = 2000) -> np.ndarray:
+    """Unit vectors drawn around random topics, closer to real ticket embeddings than pure noise."""
+    topics = rng.standard_normal((clusters, DIM), dtype=np.float32)
+    out = np.empty((rows, DIM), dtype=np.float32)
+    for start in range(0, rows, 100_000):
+        stop = min(rows, start + 100_000)
+        noise = rng.standard_normal((stop - start, DIM), dtype=np.float32)
+        out[start:stop] = l2_normalize(topics[rng.integers(clusters, size=stop - start)] + 0.6 * noise)
+    return out
+
+
+def run(name, index, matrix, queries, truth):
+    latencies, hits = [], 0
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        found, _ = index.search(matrix, q, TOP_K)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(set(found.tolist()) & set(expected.tolist()))
+    recall = hits / (len(queries) * TOP_K)
+    print(f"{name:<22} | {np.median(latencies):>9.2f} | {recall:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ANN recall@k and latency against the exact scan.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--nprobe", default="4,16,64", help="IVF nprobe values to sweep")
+    parser.add_argument("--ef-search", default="32,64,128", help="HNSW ef_search values to sweep")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    matrix = clustered_matrix(args.rows, rng)
+    queries = matrix[rng.choice(args.rows, args.queries, replace=False)] + 0.05 * rng.standard_normal((args.queries, DIM), dtype=np.float32)
+
+    print(f"{'variant':<22} | {'median ms':>9} | {'recall@' + str(TOP_K):>9}")
+    truth, latencies = [], []
+    for q in queries:
+        start = time.perf_counter()
+        truth.append(blocked_top_k(matrix, q, TOP_K)[0])
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(f"{'exact':<22} | {np.median(latencies):>9.2f} | {1.0:>9.3f}")
+
+    start = time.perf_counter()
+    ivf = IvfFlatIndex(DIM, nlist=max(16, int(np.sqrt(args.rows) * 4) // 16 * 16))
+    ivf.add(matrix, 0)
+    print(f"ivf build: {time.perf_counter() - start:.1f}s, nlist={ivf.nlist}")
+    for nprobe in [int(v) for v in args.nprobe.split(",")]:
+        ivf.nprobe = nprobe
+        run(f"ivf nprobe={nprobe}", ivf, matrix, queries, truth)
+
+    if hnswlib is None:
+        print("hnswlib not installed, skipping HNSW")
+        return
+    start = time.perf_counter()
+    hnsw = HnswIndex(DIM)
+    hnsw.add(matrix, 0)
+    print(f"hnsw build: {time.perf_counter() - start:.1f}s")
+    for ef in [int(v) for v in args.ef_search.split(",")]:
+        hnsw.set_ef_search(ef)
+        run(f"hnsw ef_search={ef}", hnsw, matrix, queries, truth)
+
+
+if __name__ == "__main__":
+    main()
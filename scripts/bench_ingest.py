@@ -0,0 +1,71 @@
+# python scripts/bench_ingest.py [--batch-sizes 1,64] [--tickets 2000]
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+repo_dir = os.path.join(script_dir, '..')
+sys.path.insert(0, repo_dir)  # make `src` importable when run from anywhere
+
+from src.index_tail import IndexTail
+
+POLL_SECONDS = 0.2
+
+
+def run(embed_batch_size: int, tickets: int, files: int, timeout: float) -> float:
+    """Start the pipeline, drop `tickets` tickets into its input and return rows/s until all are indexed."""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir, output_dir = os.path.join(tmp, "input"), os.path.join(tmp, "output")
+        os.makedirs(input_dir)
+        env = dict(os.environ, INPUT_DATA_DIR=input_dir, OUTPUT_DATA_DIR=output_dir,
+                   EMBED_BATCH_SIZE=str(embed_batch_size))
+        env.setdefault("OPENAI_API_KEY", "unused")  # config requires it, the pipeline never calls OpenAI
+        pipeline = subprocess.Popen([sys.executable, "-m", "src.pathway_pipeline"], cwd=repo_dir, env=env,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            manifest_path = os.path.join(output_dir, "index_manifest.json")
+            while not os.path.exists(manifest_path):  # model loaded, writer set up
+                if pipeline.poll() is not None:
+                    raise RuntimeError(f"pipeline exited with code {pipeline.returncode}")
+                time.sleep(POLL_SECONDS)
+
+            start = time.perf_counter()
+            subprocess.run([sys.executable, os.path.join(script_dir, "simulator.py"), "--interval", "0",
+                            "--batches", str(files), "--batch-size", str(tickets // files),
+                            "--output-dir", input_dir], check=True, stdout=subprocess.DEVNULL)
+            tail = IndexTail(manifest_path)
+            indexed = 0
+            while indexed < tickets:
+                if time.perf_counter() - start > timeout:
+                    raise TimeoutError(f"only {indexed}/{tickets} rows indexed after {timeout:.0f}s")
+                time.sleep(POLL_SECONDS)
+                if tail.needs_reset():
+                    tail.reset()
+                    indexed = 0
+                indexed += len(tail.poll())
+            return tickets / (time.perf_counter() - start)
+        finally:
+            pipeline.terminate()
+            pipeline.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end ingest throughput of the Pathway pipeline per EMBED_BATCH_SIZE.")
+    parser.add_argument("--batch-sizes", default="1,64", help="comma-separated EMBED_BATCH_SIZE values")
+    parser.add_argument("--tickets", type=int, default=2000, help="tickets written by the simulator")
+    parser.add_argument("--files", type=int, default=20, help="input files the tickets are spread over")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for each run")
+    args = parser.parse_args()
+
+    tickets = args.tickets // args.files * args.files
+    print(f"{'EMBED_BATCH_SIZE':>16} | {'rows/s':>9}")
+    for batch_size in [int(s) for s in args.batch_sizes.split(",")]:
+        print(f"{batch_size:>16} | {run(batch_size, tickets, args.files, args.timeout):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
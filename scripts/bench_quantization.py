@@ -0,0 +1,55 @@
+# python scripts/bench_quantization.py [--rows 200000] [--rerank-factor 1,2,4,8]
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(script_dir, '..'))  # make `src` importable when run from anywhere
+
+from src.quantization import QUANTIZED_STORAGES, quantized_top_k
+from src.retrieval import blocked_top_k
+from scripts.bench_ann import DIM, TOP_K, clustered_matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k, latency and memory of float16/int8 storage vs float32.")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--rerank-factor", default="1,2,4,8",
+                        help="coarse candidates per result re-scored in float32 (1 = coarse ranking only)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    matrix = clustered_matrix(args.rows, rng)
+    queries = matrix[rng.choice(args.rows, args.queries, replace=False)] + 0.05 * rng.standard_normal((args.queries, DIM), dtype=np.float32)
+
+    print(f"{'variant':<22} | {'memory MB':>9} | {'median ms':>9} | {'recall@' + str(TOP_K):>9}")
+    truth, latencies = [], []
+    for q in queries:
+        start = time.perf_counter()
+        truth.append(blocked_top_k(matrix, q, TOP_K)[0])
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(f"{'float32':<22} | {matrix.nbytes / 2**20:>9.1f} | {np.median(latencies):>9.2f} | {1.0:>9.3f}")
+
+    for name, storage in QUANTIZED_STORAGES.items():
+        start = time.perf_counter()
+        quantized = storage(DIM).updated(matrix)
+        print(f"{name} encode: {time.perf_counter() - start:.1f}s")
+        for factor in [int(v) for v in args.rerank_factor.split(",")]:
+            latencies, hits = [], 0
+            for q, expected in zip(queries, truth):
+                start = time.perf_counter()
+                found, _ = quantized_top_k(quantized, matrix, q, TOP_K, rerank_factor=factor)
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits += len(set(found.tolist()) & set(expected.tolist()))
+            recall = hits / (len(queries) * TOP_K)
+            label = f"{name} rerank x{factor}"
+            print(f"{label:<22} | {quantized.nbytes / 2**20:>9.1f} | {np.median(latencies):>9.2f} | {recall:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
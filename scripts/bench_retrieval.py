@@ -0,0 +1,85 @@
+# python scripts/bench_retrieval.py [--sizes 10000,100000,1000000]
+
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(script_dir, '..'))  # make `src` importable when run from anywhere
+
+from src.retrieval import blocked_top_k, cosine_scores, l2_normalize
+
+DIM = 384  # all-MiniLM-L6-v2
+TOP_K = 5
+
+
+def score_before(embeddings: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Original retrieve_sources scoring: float64 matrix normalized on every query."""
+    emb_norm = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    query_norm = query / np.linalg.norm(query)
+    scores = np.dot(emb_norm, query_norm)
+    return scores.argsort()[::-1][:TOP_K]
+
+
+def score_normalized(normalized: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Unit-length float32 matrix, one matrix-vector product, full argsort."""
+    scores = cosine_scores(normalized, query)
+    return scores.argsort()[::-1][:TOP_K]
+
+
+def score_current(normalized: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """What retrieve_sources runs today: blocked scan with argpartition and a top-k heap merge."""
+    return blocked_top_k(normalized, query, TOP_K)[0]
+
+
+def measure(fn, matrix, queries):
+    """Median latency (ms) over `queries` and peak bytes allocated by a single query."""
+    fn(matrix, queries[0])  # warm-up
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(matrix, q)
+        latencies.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    fn(matrix, queries[0])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return float(np.median(latencies)), peak
+
+
+def random_matrix(rows: int, rng: np.random.Generator, dtype) -> np.ndarray:
+    out = np.empty((rows, DIM), dtype=dtype)
+    for start in range(0, rows, 100_000):
+        stop = min(rows, start + 100_000)
+        out[start:stop] = rng.standard_normal((stop - start, DIM), dtype=np.float32)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-query retrieval latency and peak allocation per scoring variant.")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="comma-separated corpus sizes")
+    parser.add_argument("--queries", type=int, default=20, help="queries timed per size")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((args.queries, DIM), dtype=np.float32)
+    print(f"{'rows':>9} | {'variant':<10} | {'median ms':>9} | {'peak alloc MB':>13}")
+    for rows in [int(s) for s in args.sizes.split(",")]:
+        # The old loader produced float64 via np.array(list_of_lists)
+        embeddings = random_matrix(rows, rng, np.float64)
+        ms, peak = measure(score_before, embeddings, queries)
+        print(f"{rows:>9} | {'before':<10} | {ms:>9.2f} | {peak / 2**20:>13.1f}")
+        normalized = l2_normalize(embeddings)
+        del embeddings
+        for name, fn in (("normalized", score_normalized), ("current", score_current)):
+            ms, peak = measure(fn, normalized, queries)
+            print(f"{rows:>9} | {name:<10} | {ms:>9.2f} | {peak / 2**20:>13.1f}")
+        del normalized
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# python scripts/bench_sharded.py [--rows 1000000] [--workers 1,2,4]
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(script_dir, '..'))  # make `src` importable when run from anywhere
+
+from src.embedding_store import map_vectors
+from src.retrieval import blocked_top_k
+from src.sharded_search import ShardedSearcher
+from scripts.bench_retrieval import DIM, TOP_K, random_matrix
+
+
+def measure(search, queries):
+    """Median latency (ms) and the results of every query."""
+    search(queries[0])  # warm-up: starts the workers and faults the pages in
+    latencies, results = [], []
+    for q in queries:
+        start = time.perf_counter()
+        results.append(search(q)[0])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return float(np.median(latencies)), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exact top-k latency in-process vs split across shard workers.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated shard worker counts")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((args.queries, DIM), dtype=np.float32)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "embeddings.f32")
+        random_matrix(args.rows, rng, np.float32).tofile(path)
+        vectors = map_vectors(path, DIM, args.rows)
+
+        print(f"{'variant':<14} | {'median ms':>9} | {'same top-' + str(TOP_K):>10}")
+        ms, expected = measure(lambda q: blocked_top_k(vectors, q, TOP_K), queries)
+        print(f"{'in-process':<14} | {ms:>9.2f} | {'yes':>10}")
+        for workers in [int(w) for w in args.workers.split(",")]:
+            searcher = ShardedSearcher(workers)
+            ms, found = measure(lambda q: searcher.search(vectors, q, TOP_K), queries)
+            same = all(np.array_equal(a, b) for a, b in zip(found, expected))
+            print(f"{f'{workers} workers':<14} | {ms:>9.2f} | {'yes' if same else 'NO':>10}")
+            searcher.close()
+    print(f"cpu cores: {os.cpu_count()}")
+
+
+if __name__ == "__main__":
+    main()
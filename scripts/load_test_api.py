@@ -0,0 +1,65 @@
+# python scripts/load_test_api.py [--url http://localhost:8000] [--concurrency 1,4,16]
+
+import time
+import asyncio
+import argparse
+
+import httpx
+import numpy as np
+
+QUERIES = [
+    "What tickets mention payment?",
+    "Which customers had login problems?",
+    "Summarize recent shipping delays.",
+    "Are there complaints about the mobile app?",
+]
+
+
+async def worker(client: httpx.AsyncClient, url: str, remaining: list, latencies: list, errors: list):
+    while remaining:
+        query = remaining.pop()
+        start = time.perf_counter()
+        try:
+            response = await client.post(url, json={"query": query})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+        except httpx.HTTPError as e:
+            errors.append(e)
+
+
+async def run(url: str, concurrency: int, requests: int, timeout: float, unique: bool = False):
+    """Send `requests` queries with `concurrency` in flight; return (req/s, p50 ms, p95 ms, errors)."""
+    remaining = [QUERIES[i % len(QUERIES)] for i in range(requests)]
+    if unique:  # defeat the query-embedding and answer caches
+        remaining = [f"{query} (#{i} {time.time_ns()})" for i, query in enumerate(remaining)]
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client, url, remaining, latencies, errors) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    if not latencies:
+        return 0.0, float("nan"), float("nan"), len(errors)
+    ms = np.array(latencies) * 1000
+    return len(latencies) / elapsed, np.percentile(ms, 50), np.percentile(ms, 95), len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent /query throughput against a running API.")
+    parser.add_argument("--url", default="http://localhost:8000", help="API base URL")
+    parser.add_argument("--path", default="/query")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated in-flight request counts")
+    parser.add_argument("--requests", type=int, default=64, help="requests per concurrency level")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--unique", action="store_true", help="make every query text distinct")
+    args = parser.parse_args()
+
+    url = args.url.rstrip("/") + args.path
+    print(f"{'concurrency':>11} | {'req/s':>7} | {'p50 ms':>8} | {'p95 ms':>8} | {'errors':>6}")
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        rps, p50, p95, errors = asyncio.run(run(url, concurrency, args.requests, args.timeout, args.unique))
+        print(f"{concurrency:>11} | {rps:>7.2f} | {p50:>8.1f} | {p95:>8.1f} | {errors:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@
 import os
 import time
 import csv
+import argparse
 from datetime import datetime
 import random
 
@@ -10,19 +11,31 @@ SIMULATOR_OUTPUT_DIR = "./data/input" # Corrected path
 INTERVAL_SECONDS = 15
 BATCH_SIZE = 5
 
+parser = argparse.ArgumentParser(description="Write synthetic support-ticket CSV batches into the input directory.")
+parser.add_argument("--interval", type=float, default=INTERVAL_SECONDS, help="seconds between batch files")
+parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="tickets per batch file")
+parser.add_argument("--batches", type=int, default=0, help="stop after this many files (0 = run until interrupted)")
+parser.add_argument("--output-dir", default=None, help="target directory (default: data/input in the repo)")
+args = parser.parse_args()
+INTERVAL_SECONDS = args.interval
+BATCH_SIZE = args.batch_size
+
 # Ensure the target directory exists relative to the script's CWD when run
 # Get the directory of the current script
 script_dir = os.path.dirname(os.path.abspath(__file__))
 # Construct the absolute path for the output directory
 absolute_output_dir = os.path.join(script_dir, '..', 'data', 'input') # Go up one level from 'scripts', then into 'data/input'
+if args.output_dir:
+    absolute_output_dir = os.path.abspath(args.output_dir)
 
 os.makedirs(absolute_output_dir, exist_ok=True)
 print(f"Simulator writing files to: {absolute_output_dir}") # Print absolute path
 print(f"Generating {BATCH_SIZE} tickets every {INTERVAL_SECONDS} seconds...")
 
 ticket_counter = 0
+batches_written = 0
 try:
-    while True:
+    while args.batches == 0 or batches_written < args.batches:
         print(f"\nSIMULATOR: Waiting {INTERVAL_SECONDS}s...")
         time.sleep(INTERVAL_SECONDS)
 
@@ -55,6 +68,7 @@ try:
                 writer.writerow(["ticket_id", "timestamp", "customer_id", "subject", "body"])
                 writer.writerows(batch_data)
             print(f"SIMULATOR: Created {filename} with {len(batch_data)} tickets.")
+            batches_written += 1
         except IOError as e:
             print(f"SIMULATOR: Error writing file {filename}: {e}")
         except Exception as e:
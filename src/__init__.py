@@ -1,11 +1,18 @@
-
 # this is init file for src folder
 
-from .rag import get_chat_engine, reload_index
-from .pathway_pipeline import run_pathway_pipeline
-
 __all__ = ['get_chat_engine', 'reload_index', 'run_pathway_pipeline']
 
 # Add this line to the end of the file
 __version__ = '0.1.0'
 
+
+# Imported lazily: importing the package (e.g. from scripts/ benchmarks) must not
+# load the embedding model, require OPENAI_API_KEY or start the Pathway pipeline
+def __getattr__(name):
+    if name in ('get_chat_engine', 'reload_index'):
+        from . import rag
+        return getattr(rag, name)
+    if name == 'run_pathway_pipeline':
+        from . import pathway_pipeline
+        return getattr(pathway_pipeline, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,306 @@
+# python src/ann.py
+
+import os
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+import numpy as np
+
+from src.retrieval import BLOCK_ROWS, blocked_top_k, l2_normalize, top_k
+
+try:
+    import hnswlib
+except ImportError:  # optional, only needed for ANN_BACKEND=hnsw
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Config
+# ---------------------------
+HNSW_M = int(os.environ.get("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.environ.get("HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.environ.get("HNSW_EF_SEARCH", "64"))  # higher = better recall, slower
+IVF_NLIST = int(os.environ.get("IVF_NLIST", "1024"))
+IVF_NPROBE = int(os.environ.get("IVF_NPROBE", "16"))  # higher = better recall, slower
+IVF_TRAIN_ITERATIONS = 10
+IVF_TRAIN_SAMPLE_PER_LIST = 64
+ANN_OVERSAMPLE = 2  # candidates fetched per result, to survive filtering of dead rows
+
+
+class SharedLock:
+    """Readers-writer lock: any number of `shared` holders, or one `exclusive` holder.
+
+    A waiting writer blocks new readers, so a steady query load cannot starve it.
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+
+    @contextmanager
+    def shared(self):
+        with self._cond:
+            while self._writing:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._cond:
+            while self._writing:
+                self._cond.wait()
+            self._writing = True
+            while self._readers:
+                self._cond.wait()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
+class VectorIndex:
+    """Approximate nearest neighbour index over the rows of the embedding matrix.
+
+    Rows are identified by their position in the (L2-normalized) matrix and are
+    only ever appended. Dead rows are not removed from the index; `search`
+    filters them out with the liveness mask instead.
+
+    One index is shared by every published snapshot while the refresh thread
+    keeps adding to it, so `search` only returns rows below len(matrix): a query
+    on an older, shorter snapshot never sees rows it cannot resolve.
+    """
+    name = None
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.rows = 0
+        self._lock = SharedLock()  # searches share it, changes that move memory hold it alone
+
+    def add(self, matrix: np.ndarray, start_row: int):
+        """Index the rows matrix[start_row:]."""
+        raise NotImplementedError
+
+    def search(self, matrix: np.ndarray, query: np.ndarray, k: int, mask: Optional[np.ndarray] = None):
+        """Return (indices, scores) of the approximate top-k rows, best first."""
+        raise NotImplementedError
+
+    def save(self, path: str):
+        raise NotImplementedError
+
+    @classmethod
+    def load(cls, path: str, dim: int) -> "VectorIndex":
+        raise NotImplementedError
+
+
+class HnswIndex(VectorIndex):
+    """HNSW graph index backed by hnswlib. Keeps its own copy of the vectors."""
+    name = "hnsw"
+
+    def __init__(self, dim: int, m: int = HNSW_M, ef_construction: int = HNSW_EF_CONSTRUCTION,
+                 ef_search: int = HNSW_EF_SEARCH, index=None):
+        if hnswlib is None:
+            raise ImportError("ANN_BACKEND=hnsw requires hnswlib (pip install hnswlib)")
+        super().__init__(dim)
+        self.ef_search = ef_search
+        if index is None:
+            # Rows are unit length, so inner product is the cosine similarity
+            index = hnswlib.Index(space="ip", dim=dim)
+            index.init_index(max_elements=1024, M=m, ef_construction=ef_construction)
+        self._index = index
+        self._index.set_ef(ef_search)
+        self.rows = self._index.get_current_count()
+
+    def set_ef_search(self, ef_search: int):
+        self.ef_search = ef_search
+        self._index.set_ef(ef_search)
+
+    def add(self, matrix: np.ndarray, start_row: int):
+        end_row = len(matrix)
+        if end_row <= start_row:
+            return
+        capacity = self._index.get_max_elements()
+        if end_row > capacity:
+            # hnswlib reallocates on resize, which must not run under a knn_query;
+            # add_items itself is safe alongside queries
+            with self._lock.exclusive():
+                self._index.resize_index(max(end_row, 2 * capacity))
+        for start in range(start_row, end_row, BLOCK_ROWS):
+            stop = min(end_row, start + BLOCK_ROWS)
+            self._index.add_items(np.asarray(matrix[start:stop]), np.arange(start, stop))
+        self.rows = end_row
+
+    def search(self, matrix: np.ndarray, query: np.ndarray, k: int, mask: Optional[np.ndarray] = None):
+        indexed = self.rows
+        if indexed == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = l2_normalize(query)
+        wanted = min(indexed, k * ANN_OVERSAMPLE)
+        while True:
+            with self._lock.shared():
+                labels, distances = self._index.knn_query(query, k=wanted)
+            labels, scores = labels[0].astype(np.int64), 1.0 - distances[0]
+            # Rows added after the caller's snapshot was published are not in its matrix
+            keep = labels < len(matrix)
+            if mask is not None:
+                keep[keep] = mask[labels[keep]]
+            labels, scores = labels[keep], scores[keep]
+            # Too many candidates were dead (or newer) rows: widen the search
+            if len(labels) >= k or wanted >= indexed:
+                return labels[:k], scores[:k].astype(np.float32)
+            wanted = min(indexed, wanted * 2)
+
+    def save(self, path: str):
+        self._index.save_index(path)
+
+    @classmethod
+    def load(cls, path: str, dim: int) -> "HnswIndex":
+        if hnswlib is None:
+            raise ImportError("ANN_BACKEND=hnsw requires hnswlib (pip install hnswlib)")
+        index = hnswlib.Index(space="ip", dim=dim)
+        index.load_index(path)
+        return cls(dim, index=index)
+
+
+class IvfFlatIndex(VectorIndex):
+    """IVF-flat index in NumPy: rows are bucketed by their nearest k-means centroid.
+
+    A query scores the `nprobe` closest buckets exactly against the memory-mapped
+    matrix, so no copy of the vectors is kept. Until enough rows exist to train
+    the centroids, search falls back to the exact scan.
+    """
+    name = "ivf"
+
+    def __init__(self, dim: int, nlist: int = IVF_NLIST, nprobe: int = IVF_NPROBE):
+        super().__init__(dim)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.centroids = None
+        self.lists = []
+
+    def _train(self, matrix: np.ndarray) -> np.ndarray:
+        rng = np.random.default_rng(0)
+        sample_size = min(len(matrix), self.nlist * IVF_TRAIN_SAMPLE_PER_LIST)
+        sample = np.asarray(matrix[np.sort(rng.choice(len(matrix), sample_size, replace=False))])
+        centroids = sample[rng.choice(sample_size, self.nlist, replace=False)]
+        # Spherical k-means: assign by inner product, renormalize the means
+        for _ in range(IVF_TRAIN_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = l2_normalize(sums)
+        return centroids
+
+    def add(self, matrix: np.ndarray, start_row: int):
+        end_row = len(matrix)
+        centroids, lists = self.centroids, self.lists
+        if centroids is None:
+            if end_row < self.nlist * IVF_TRAIN_SAMPLE_PER_LIST // 4:
+                self.rows = end_row
+                return
+            centroids = self._train(matrix)
+            lists = [np.empty(0, dtype=np.int64) for _ in range(self.nlist)]
+            start_row = 0
+        # Built on a copy and swapped in, so searches never see half-assigned buckets
+        lists = list(lists)
+        for start in range(start_row, end_row, BLOCK_ROWS):
+            stop = min(end_row, start + BLOCK_ROWS)
+            assignment = np.argmax(np.asarray(matrix[start:stop]) @ centroids.T, axis=1)
+            order = np.argsort(assignment, kind="stable")
+            buckets, first = np.unique(assignment[order], return_index=True)
+            for c, members in zip(buckets, np.split(order + start, first[1:])):
+                lists[c] = np.concatenate([lists[c], members])
+        with self._lock.exclusive():
+            self.centroids, self.lists, self.rows = centroids, lists, end_row
+
+    def search(self, matrix: np.ndarray, query: np.ndarray, k: int, mask: Optional[np.ndarray] = None):
+        with self._lock.shared():
+            centroids, lists = self.centroids, self.lists
+        if centroids is None:
+            return blocked_top_k(matrix, query, k, mask=mask)
+        query = l2_normalize(query)
+        probe = top_k(centroids @ query, self.nprobe)
+        rows = np.sort(np.concatenate([lists[c] for c in probe]))  # sorted for sequential page-ins
+        # Rows added after the caller's snapshot was published are not in its matrix
+        rows = rows[:np.searchsorted(rows, len(matrix))]
+        if mask is not None:
+            rows = rows[mask[rows]]
+        scores = np.asarray(matrix[rows]) @ query
+        best = top_k(scores, k)
+        return rows[best], scores[best]
+
+    def save(self, path: str):
+        lengths = np.array([len(rows) for rows in self.lists], dtype=np.int64)
+        with open(path, "wb") as f:
+            np.savez(f, rows=np.array(self.rows), nprobe=np.array(self.nprobe),
+                     centroids=self.centroids if self.centroids is not None else np.empty((0, self.dim), np.float32),
+                     lengths=lengths, members=np.concatenate(self.lists) if self.lists else np.empty(0, np.int64))
+
+    @classmethod
+    def load(cls, path: str, dim: int) -> "IvfFlatIndex":
+        data = np.load(path)
+        index = cls(dim, nprobe=int(data["nprobe"]))
+        index.rows = int(data["rows"])
+        if len(data["centroids"]):
+            index.nlist = len(data["centroids"])
+            index.centroids = data["centroids"]
+            index.lists = np.split(data["members"], np.cumsum(data["lengths"])[:-1])
+        return index
+
+
+ANN_BACKENDS = {cls.name: cls for cls in (HnswIndex, IvfFlatIndex)}
+
+
+# ---------------------------
+# Persistence
+# ---------------------------
+def _index_paths(backend: str, out_dir: str):
+    base = os.path.join(out_dir, f"ann_{backend}")
+    return base + ".bin", base + ".json"
+
+
+def save_vector_index(index: VectorIndex, manifest: dict, out_dir: str):
+    """Save the index next to the store, tagged with the store generation it indexes."""
+    data_path, meta_path = _index_paths(index.name, out_dir)
+    # Every API worker saves its own copy: temp names are per process, so no two writers share one
+    suffix = f".{os.getpid()}.tmp"
+    index.save(data_path + suffix)
+    os.replace(data_path + suffix, data_path)
+    with open(meta_path + suffix, "w", encoding="utf-8") as f:
+        json.dump({"created": manifest["created"], "generation": manifest["generation"], "rows": index.rows}, f)
+    os.replace(meta_path + suffix, meta_path)
+
+
+def load_vector_index(backend: str, manifest: dict, out_dir: str) -> Optional[VectorIndex]:
+    """Load a saved index if it was built from the store generation in `manifest`."""
+    data_path, meta_path = _index_paths(backend, out_dir)
+    if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+        return None
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    if (meta["created"], meta["generation"]) != (manifest["created"], manifest["generation"]):
+        return None
+    try:
+        index = ANN_BACKENDS[backend].load(data_path, manifest["dim"])
+    except Exception as e:
+        logger.warning(f"Failed to load saved {backend} index, rebuilding: {e}")
+        return None
+    # Another process replaced one file of the pair between our two reads
+    if index.rows != meta["rows"]:
+        logger.warning(f"Saved {backend} index and its metadata are from different saves, rebuilding")
+        return None
+    return index
@@ -0,0 +1,69 @@
+# python src/answer_cache.py
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+import numpy as np
+
+# Entries kept per (sources, prompt version, index version) bucket, i.e. paraphrases of one question
+MAX_QUERIES_PER_BUCKET = 8
+
+
+class AnswerCache:
+    """Semantic cache of generated answers.
+
+    An answer is reused when a new query retrieved exactly the same ticket
+    versions, with the same prompt version and index version, and its unit-length
+    embedding is within `threshold` cosine similarity of a cached query. Ticket
+    versions are (ticket_id, time) pairs, so an edited ticket never matches an
+    answer written from its old text. Buckets are evicted least recently used
+    beyond `max_entries`, and entries expire after `ttl` seconds.
+    """
+    def __init__(self, max_entries: int, ttl: float, threshold: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._buckets = OrderedDict()  # key -> [(query vector, answer, stored at)]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(source_versions: Iterable, prompt_version: str, index_version) -> tuple:
+        return frozenset(source_versions), prompt_version, index_version
+
+    def get(self, key: tuple, query_vector: np.ndarray) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entries = self._buckets.get(key)
+            if entries:
+                entries[:] = [e for e in entries if now - e[2] < self.ttl]
+                for vector, answer, _ in entries:
+                    if float(np.dot(vector, query_vector)) >= self.threshold:
+                        self._buckets.move_to_end(key)
+                        self.hits += 1
+                        return answer
+                if not entries:
+                    del self._buckets[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, query_vector: np.ndarray, answer: str):
+        with self._lock:
+            entries = self._buckets.setdefault(key, [])
+            entries.append((query_vector, answer, time.time()))
+            del entries[:-MAX_QUERIES_PER_BUCKET]
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+
+    def evict_index_versions(self, index_version):
+        """Drop every entry that was not written against `index_version`."""
+        with self._lock:
+            for key in [k for k in self._buckets if k[2] != index_version]:
+                del self._buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
@@ -1,13 +1,21 @@
 # python src/api.py
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional
+import json
+import math
 import logging
 
-from src.rag import get_chat_engine
+from src.metadata_index import parse_timestamp
+from src.rag import TOP_K, get_chat_engine
 
 logger = logging.getLogger(__name__)
 
+MAX_BATCH_QUERIES = 1000
+SEARCH_MAX_RESULTS = 1000  # /search ranks this many tickets per query; pages are slices of that ranking
+
 app = FastAPI(title="Realtime RAG API")
 
 class QueryRequest(BaseModel):
@@ -17,12 +25,32 @@ class SourceNodeModel(BaseModel):
     id: str
     text: Optional[str] = None
     metadata: Optional[dict] = {}
-    score: Optional[float] = None
+    score: Optional[float] = Field(None, description="Cosine similarity of the ticket's best-matching chunk")
+    rank_score: Optional[float] = Field(None, description="Reciprocal-rank fusion score the results are sorted by "
+                                                          "(RETRIEVAL_MODE=hybrid only, else null)")
 
 class QueryResponse(BaseModel):
     answer: str = Field(..., description="The generated answer")
     sources: List[SourceNodeModel] = Field(default_factory=list, description="List of source documents used")
 
+class SearchResponse(BaseModel):
+    query: str
+    offset: int
+    results: List[SourceNodeModel] = Field(default_factory=list, description="Ranked tickets, best first")
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str] = Field(..., description=f"Questions to answer, at most {MAX_BATCH_QUERIES}")
+    top_k: int = Field(TOP_K, ge=1, le=100, description="Sources retrieved per query")
+    retrieval_only: bool = Field(False, description="Skip answer generation and return sources only")
+
+class BatchQueryResult(BaseModel):
+    query: str
+    answer: Optional[str] = Field(None, description="The generated answer, null in retrieval-only mode")
+    sources: List[SourceNodeModel] = Field(default_factory=list)
+
+class BatchQueryResponse(BaseModel):
+    results: List[BatchQueryResult] = Field(default_factory=list, description="One result per query, in order")
+
 @app.on_event("startup")
 async def startup_event():
     try:
@@ -32,6 +60,15 @@ async def startup_event():
         logger.error(f"API startup failed to load chat engine: {e}", exc_info=True)
         # Depending on severity, you might want to prevent startup
 
+def source_model(node) -> SourceNodeModel:
+    return SourceNodeModel(
+        id=node.node_id,
+        text=node.get_content(metadata_mode="all"), # Or adjust as needed
+        metadata=node.metadata or {},
+        score=node.score,
+        rank_score=node.rank_score
+    )
+
 @app.post("/query", response_model=QueryResponse)
 async def handle_query(request: QueryRequest):
     try:
@@ -42,14 +79,88 @@ async def handle_query(request: QueryRequest):
         sources_data = []
         if hasattr(response, 'source_nodes'):
              for node in response.source_nodes:
-                 sources_data.append(SourceNodeModel(
-                     id=node.node_id,
-                     text=node.get_content(metadata_mode="all"), # Or adjust as needed
-                     metadata=node.metadata or {},
-                     score=node.score
-                 ))
+                 sources_data.append(source_model(node))
 
         return QueryResponse(answer=str(response.response), sources=sources_data)
     except Exception as e:
         logger.error(f"Error processing query '{request.query}': {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Failed to process query: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to process query: {str(e)}")
+
+@app.post("/query/stream")
+async def handle_query_stream(request: QueryRequest):
+    """Newline-delimited JSON: one {"type": "sources"} event, then {"type": "token"} events, then {"type": "done"}."""
+    try:
+        chat_engine = get_chat_engine()
+        logger.info(f"Received streaming query: {request.query}")
+        # Retrieve before the response starts, so retrieval failures still map to a 500
+        query_emb = await chat_engine.aencode_query(request.query)
+        sources = await chat_engine.aretrieve_sources(request.query, query_emb=query_emb)
+    except Exception as e:
+        logger.error(f"Error processing query '{request.query}': {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to process query: {str(e)}")
+
+    async def events():
+        yield json.dumps({"type": "sources", "sources": jsonable_encoder([source_model(n) for n in sources])}) + "\n"
+        try:
+            async for text in chat_engine.astream_answer(request.query, sources, query_emb):
+                yield json.dumps({"type": "token", "text": text}) + "\n"
+        except Exception as e:
+            logger.error(f"Error streaming answer for '{request.query}': {e}", exc_info=True)
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+            return
+        yield json.dumps({"type": "done"}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/query/batch", response_model=BatchQueryResponse)
+async def handle_query_batch(request: BatchQueryRequest):
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+    try:
+        chat_engine = get_chat_engine()
+        logger.info(f"Received batch of {len(request.queries)} queries (retrieval_only={request.retrieval_only})")
+        responses = await chat_engine.achat_batch(request.queries, top_k=request.top_k,
+                                                  retrieval_only=request.retrieval_only)
+        return BatchQueryResponse(results=[
+            BatchQueryResult(query=query, answer=response.response,
+                             sources=[source_model(node) for node in response.source_nodes])
+            for query, response in zip(request.queries, responses)
+        ])
+    except Exception as e:
+        logger.error(f"Error processing query batch: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to process query batch: {str(e)}")
+
+def _parse_time_param(name: str, value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    parsed = parse_timestamp(value)
+    if math.isnan(parsed):
+        raise HTTPException(status_code=400, detail=f"'{name}' must be an ISO-8601 timestamp, got '{value}'")
+    return parsed
+
+@app.get("/search", response_model=SearchResponse)
+async def handle_search(
+    q: str = Query(..., description="Search text"),
+    top_k: int = Query(TOP_K, ge=1, le=100, description="Results per page"),
+    offset: int = Query(0, ge=0, le=SEARCH_MAX_RESULTS, description="Results to skip, for pagination"),
+    min_score: Optional[float] = Query(None, description="Drop results with a lower cosine score"),
+    customer_id: Optional[str] = Query(None, description="Only tickets of this customer"),
+    since: Optional[str] = Query(None, description="Only tickets with timestamp >= this ISO-8601 time"),
+    until: Optional[str] = Query(None, description="Only tickets with timestamp <= this ISO-8601 time"),
+):
+    """Ranked tickets for a query without LLM generation.
+
+    Every page ranks to the same depth and slices it: a page's top_k would change
+    the candidate depth (and the hybrid fusion), so tickets could shift between pages.
+    """
+    filters = dict(customer_id=customer_id, since=_parse_time_param("since", since),
+                   until=_parse_time_param("until", until), min_score=min_score)
+    try:
+        chat_engine = get_chat_engine()
+        query_emb = await chat_engine.aencode_query(q)
+        sources = await chat_engine.aretrieve_sources(q, top_k=SEARCH_MAX_RESULTS, query_emb=query_emb, **filters)
+        return SearchResponse(query=q, offset=offset,
+                              results=[source_model(node) for node in sources[offset:offset + top_k]])
+    except Exception as e:
+        logger.error(f"Error processing search '{q}': {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to process search: {str(e)}")
@@ -0,0 +1,56 @@
+# python src/chunking.py
+
+import os
+from typing import List
+
+# ---------------------------
+# Config
+# ---------------------------
+# all-MiniLM-L6-v2 reads at most 256 word pieces (~1000 characters of English); anything
+# past that is silently dropped, so longer texts are embedded as several chunks
+CHUNK_SIZE_CHARS = int(os.environ.get("CHUNK_SIZE_CHARS", "800"))
+CHUNK_OVERLAP_CHARS = int(os.environ.get("CHUNK_OVERLAP_CHARS", "160"))  # repeated at the start of the next chunk
+SEPARATORS = ("\n\n", "\n", ". ", " ")  # preferred split points, coarsest first
+
+
+def _pieces(text: str, limit: int, separators) -> List[str]:
+    """Split `text` into pieces of at most `limit` characters at the coarsest separator that works.
+
+    Separators stay attached to the end of their piece, so the pieces join back into `text`.
+    """
+    if len(text) <= limit:
+        return [text] if text else []
+    if not separators:
+        return [text[i:i + limit] for i in range(0, len(text), limit)]
+    sep, finer = separators[0], separators[1:]
+    parts = text.split(sep)
+    pieces = []
+    for i, part in enumerate(parts):
+        if i < len(parts) - 1:
+            part += sep
+        pieces.extend(_pieces(part, limit, finer))
+    return pieces
+
+
+def split_text(text: str, chunk_size: int = CHUNK_SIZE_CHARS, overlap: int = CHUNK_OVERLAP_CHARS) -> List[str]:
+    """Overlapping chunks of at most `chunk_size` characters, split at paragraph, line, sentence or word ends.
+
+    Texts that fit are returned as a single chunk unchanged, so short tickets
+    embed exactly as before. Each further chunk starts with up to `overlap`
+    characters (whole words) from the end of the previous one.
+    """
+    text = text or ""
+    if len(text) <= chunk_size:
+        return [text]
+    overlap = min(overlap, chunk_size // 2)
+    chunks, current = [], ""
+    for piece in _pieces(text, chunk_size - overlap, SEPARATORS):
+        if current.strip() and len(current) + len(piece) > chunk_size:
+            chunks.append(current.strip())
+            current = current[len(current) - overlap:] if overlap else ""
+            space = current.find(" ")
+            current = current[space + 1:] if space >= 0 else current
+        current += piece
+    if current.strip():
+        chunks.append(current.strip())
+    return chunks
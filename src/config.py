@@ -12,6 +12,20 @@ PATHWAY_VECTOR_PORT = int(os.environ.get("PATHWAY_VECTOR_PORT", "8900"))
 API_PORT = int(os.environ.get("API_PORT", "8000"))
 STREAMLIT_PORT = int(os.environ.get("STREAMLIT_PORT", "8501"))
 INPUT_DATA_DIR = os.environ.get("INPUT_DATA_DIR", "/app/data/input")
+# Pathway commits input rows at least this often; each commit ends with a published index snapshot
+INPUT_AUTOCOMMIT_MS = int(os.environ.get("INPUT_AUTOCOMMIT_MS", "200"))
+# Pathway persistence (opt-in, e.g. /app/data/pstorage): input offsets and embeddings survive
+# restarts, so a restart only processes new input. A resumed pipeline only accepts new input
+# files (Pathway 0.12 panics when a file it restored is changed or deleted), see the README.
+# Empty (default) disables it: every start re-reads and re-indexes all input.
+PERSISTENCE_DIR = os.environ.get("PERSISTENCE_DIR", "")
+PERSISTENCE_SNAPSHOT_INTERVAL_MS = int(os.environ.get("PERSISTENCE_SNAPSHOT_INTERVAL_MS", "1000"))
+# Worker processes parsing documents (PDF, Parquet, text) in the input directory; 0 ingests only CSV and JSONL
+INGEST_PARSE_WORKERS = int(os.environ.get("INGEST_PARSE_WORKERS", "2"))
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "64"))  # max texts per encode() call in the pipeline
+EMBED_BATCH_MAX_WAIT_MS = float(os.environ.get("EMBED_BATCH_MAX_WAIT_MS", "10"))
+EMBED_CACHE_PATH = os.environ.get("EMBED_CACHE_PATH", "/app/data/cache/embeddings.sqlite")  # empty disables the cache
+EMBED_CACHE_MAX_MB = float(os.environ.get("EMBED_CACHE_MAX_MB", "1024"))
 
 if not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY environment variable not set.")
\ No newline at end of file
@@ -0,0 +1,88 @@
+# python src/document_parsers.py
+
+import os
+import time
+import logging
+from datetime import datetime, timezone
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Optional parsers: without them the matching files are skipped with a warning
+try:
+    from pypdf import PdfReader
+except ImportError:
+    try:
+        from PyPDF2 import PdfReader  # pypdf's predecessor, same API
+    except ImportError:
+        PdfReader = None
+
+# ---------------------------
+# Config
+# ---------------------------
+TICKET_FIELDS = ("ticket_id", "timestamp", "customer_id", "subject", "body")
+# Document formats parsed in the worker pool, by file extension. CSV and JSONL tickets are
+# read by Pathway's own connectors (see src/pathway_pipeline.py)
+DOCUMENT_FORMATS = {
+    ".pdf": "pdf",
+    ".parquet": "parquet",
+    ".txt": "text",
+    ".md": "text",
+}
+
+
+def document_format(path: str) -> Optional[str]:
+    """Format name parsed for `path`, None if it is not a document file."""
+    return DOCUMENT_FORMATS.get(os.path.splitext(path)[1].lower())
+
+
+def _document_row(path: str, name: str, subject: str, body: str) -> dict:
+    """A whole file as one ticket-shaped row: `name` is its id, its mtime the timestamp."""
+    modified = datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc).isoformat()
+    return dict(ticket_id=name, timestamp=modified, customer_id="",
+                subject=subject or os.path.splitext(os.path.basename(path))[0], body=body)
+
+
+def parse_pdf(path: str, name: str) -> List[dict]:
+    if PdfReader is None:
+        raise RuntimeError("PDF input needs pypdf (pip install pypdf)")
+    reader = PdfReader(path)
+    pages = [page.extract_text() or "" for page in reader.pages]
+    title = reader.metadata.get("/Title") if reader.metadata else None
+    return [_document_row(path, name, str(title or "").strip(), "\n\n".join(p.strip() for p in pages))]
+
+
+def parse_text(path: str, name: str) -> List[dict]:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return [_document_row(path, name, "", f.read())]
+
+
+def parse_parquet(path: str, name: str) -> List[dict]:
+    """Ticket rows of a Parquet file; missing columns are empty, ids default to <file>:<row>."""
+    import pandas as pd  # needs pyarrow (or fastparquet)
+
+    frame = pd.read_parquet(path)
+    rows = []
+    for i, record in enumerate(frame.to_dict(orient="records")):
+        row = {field: "" if pd.isna(record.get(field)) else str(record[field]) for field in TICKET_FIELDS}
+        row["ticket_id"] = row["ticket_id"] or f"{name}:{i}"
+        rows.append(row)
+    return rows
+
+
+PARSERS = {
+    "pdf": parse_pdf,
+    "parquet": parse_parquet,
+    "text": parse_text,
+}
+
+
+def parse_file(path: str, root: str):
+    """Parse one document file under the input directory `root`. Runs in the parser worker processes.
+
+    The file's path relative to `root` names it, so equal file names in different
+    subdirectories stay different tickets. Returns (rows, bytes read, seconds spent parsing).
+    """
+    start = time.perf_counter()
+    rows = PARSERS[document_format(path)](path, os.path.relpath(path, root))
+    return rows, os.path.getsize(path), time.perf_counter() - start
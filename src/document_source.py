@@ -0,0 +1,184 @@
+# python src/document_source.py
+
+import os
+import json
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import List, Optional
+
+import pathway as pw
+from pathway.engine import SessionType
+
+from src.document_parsers import document_format, parse_file
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Config
+# ---------------------------
+SCAN_SECONDS = 1.0  # how often the input directory is listed for new, changed or deleted documents
+METRICS_REPORT_SECONDS = 60.0
+
+
+class DocumentSchema(pw.Schema):
+    source: str = pw.column_definition(primary_key=True)  # "<path>#<row in file>"
+    ticket_id: str
+    timestamp: str
+    customer_id: str
+    subject: str
+    body: str
+
+
+class IngestMetrics:
+    """Per-format ingestion counters: rows, and for parsed documents files, bytes and parse time.
+
+    Thread-safe; the pipeline's subscribers and the document source record
+    into one instance. A summary is logged at most every `report_seconds`.
+    """
+    def __init__(self, report_seconds: float = METRICS_REPORT_SECONDS):
+        self.report_seconds = report_seconds
+        self.formats = {}  # format -> counters
+        self._lock = threading.Lock()
+        self._reported_at = time.monotonic()
+
+    def record(self, fmt: str, rows: int = 0, files: int = 0, nbytes: int = 0, seconds: float = 0.0,
+               failed: int = 0):
+        now = time.monotonic()
+        with self._lock:
+            stats = self.formats.setdefault(fmt, dict(rows=0, files=0, bytes=0, parse_seconds=0.0, failed=0,
+                                                      first=now, last=now))
+            stats["rows"] += rows
+            stats["files"] += files
+            stats["bytes"] += nbytes
+            stats["parse_seconds"] += seconds
+            stats["failed"] += failed
+            stats["last"] = now
+            report = now - self._reported_at >= self.report_seconds
+            if report:
+                self._reported_at = now
+        if report:
+            self.report()
+
+    def summary(self) -> List[str]:
+        """One line per format; rows/s are measured from its first to its latest rows."""
+        lines = []
+        with self._lock:
+            for fmt, stats in sorted(self.formats.items()):
+                line = f"{fmt}: {stats['rows']} rows"
+                elapsed = stats["last"] - stats["first"]
+                if elapsed >= 1.0:
+                    line += f" ({stats['rows'] / elapsed:.0f} rows/s)"
+                if stats["files"] or stats["failed"]:
+                    line += f", {stats['files']} files, {stats['bytes'] / 2**20:.1f} MB, {stats['failed']} failed"
+                if stats["parse_seconds"] > 0:
+                    line += (f", {stats['parse_seconds']:.1f}s parsing "
+                             f"({stats['bytes'] / 2**20 / stats['parse_seconds']:.1f} MB/s per worker)")
+                lines.append(line)
+        return lines
+
+    def report(self):
+        for line in self.summary():
+            logger.info(f"Ingested {line}")
+
+
+class DocumentDirectorySubject(pw.io.python.ConnectorSubject):
+    """Streams the document files of a directory (PDF, Parquet, text) into Pathway as ticket rows.
+
+    The directory tree is listed every SCAN_SECONDS. New or changed files are
+    parsed by a pool of worker processes, and a file's rows replace its
+    previous rows when they are ready; the rows of deleted files are
+    retracted. Parsing never runs on Pathway's threads, so a large PDF only
+    delays its own rows while the CSV and JSONL connectors keep committing.
+
+    Rows are upserted by `source`: after a restart with persistence, the
+    files are parsed again and rows equal to the restored ones change nothing.
+    """
+    def __init__(self, directory: str, workers: int, metrics: Optional[IngestMetrics] = None):
+        super().__init__()
+        self.directory = directory
+        self.workers = workers
+        self.metrics = metrics
+        self._signatures = {}  # path -> (mtime_ns, size) last submitted for parsing
+        self._sent = {}  # path -> rows currently in the table
+
+    def _is_finite(self) -> bool:
+        return False
+
+    @property
+    def _session_type(self) -> SessionType:
+        return SessionType.UPSERT
+
+    def run(self):
+        # spawn: the pipeline process runs threads (Pathway, the embedding batcher), forking it is unsafe
+        pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        logger.info(f"Parsing documents in {self.directory} with {self.workers} worker processes")
+        parsing = {}  # future -> (path, format)
+        while True:
+            changed = self._scan(pool, parsing)
+            if parsing:
+                done, _ = wait(list(parsing), timeout=SCAN_SECONDS, return_when=FIRST_COMPLETED)
+            else:
+                done = ()
+                time.sleep(SCAN_SECONDS)
+            for future in done:
+                path, fmt = parsing.pop(future)
+                changed |= self._parsed(path, fmt, future)
+            if changed:
+                self.commit()
+
+    def _scan(self, pool: ProcessPoolExecutor, parsing: dict) -> bool:
+        """Submit new and changed files, retract deleted ones. Returns True if rows were retracted."""
+        files = {}
+        # Subdirectories included, like the CSV and JSONL connectors
+        for directory, _, names in os.walk(self.directory):
+            for name in names:
+                if document_format(name):
+                    path = os.path.join(directory, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue  # deleted since the listing
+                    files[path] = (st.st_mtime_ns, st.st_size)
+        busy = {path for path, _ in parsing.values()}
+        for path, signature in files.items():
+            # A file still being parsed is submitted again, if it changed, once that parse is done
+            if path not in busy and self._signatures.get(path) != signature:
+                self._signatures[path] = signature
+                parsing[pool.submit(parse_file, path, self.directory)] = (path, document_format(path))
+        deleted = [path for path in self._signatures if path not in files]
+        for path in deleted:
+            del self._signatures[path]
+            self._retract(path)
+        return bool(deleted)
+
+    def _parsed(self, path: str, fmt: str, future) -> bool:
+        """Replace the rows of `path` with the parse result. Returns True if the table changed."""
+        if path not in self._signatures:
+            return False  # deleted while it was parsed
+        try:
+            rows, nbytes, seconds = future.result()
+        except Exception as e:
+            # Retried when the file changes (e.g. a PDF that was still being copied)
+            logger.error(f"Failed to parse {path}: {e}")
+            if self.metrics is not None:
+                self.metrics.record(fmt, failed=1)
+            return False
+        if self.metrics is not None:
+            self.metrics.record(fmt, rows=len(rows), files=1, nbytes=nbytes, seconds=seconds)
+        if rows == self._sent.get(path):
+            return False  # touched, content unchanged
+        for i, row in enumerate(rows):
+            self.next(source=f"{path}#{i}", **row)
+        self._retract(path, start=len(rows))
+        self._sent[path] = rows
+        return True
+
+    def _retract(self, path: str, start: int = 0):
+        """Delete the rows of `path` from index `start` on (all of them by default)."""
+        # _remove is the deletion counterpart of next(); it takes the row as JSON, like next_json
+        rows = self._sent.pop(path, [])
+        for i, row in enumerate(rows[start:], start):
+            self._remove(None, json.dumps(dict(source=f"{path}#{i}", **row)).encode("utf-8"))
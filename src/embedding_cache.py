@@ -0,0 +1,122 @@
+# python src/embedding_cache.py
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Config
+# ---------------------------
+CACHE_EVICT_TO = 0.9  # after exceeding max_bytes, evict least recently used entries down to this share
+CACHE_REPORT_EVERY = 10000  # log the hit rate every N lookups
+
+
+def text_key(model_name: str, text: str) -> bytes:
+    """Cache key of a text: sha256 over the model name and the exact text."""
+    return hashlib.sha256(model_name.encode("utf-8") + b"\0" + text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """Persistent text -> embedding cache in a local SQLite file.
+
+    Entries are keyed by ``text_key(model_name, text)``, so switching models never
+    returns stale vectors. Vectors are stored as raw float32 bytes. Once the stored
+    vectors exceed `max_bytes`, the least recently used entries are evicted.
+    Not thread-safe: use it from one thread (the embedding micro-batcher worker).
+    """
+    def __init__(self, path: str, model_name: str, max_bytes: int):
+        self.path = path
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._reported = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._db.commit()
+        self.size_bytes = self._db.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+        logger.info(f"Embedding cache {path}: {self.size_bytes / 2**20:.1f} MB cached")
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def _select(self, column: str, keys: List[bytes]) -> dict:
+        """key -> column for the keys that are cached."""
+        found = {}
+        for start in range(0, len(keys), 500):  # stay below SQLite's bound-parameter limit
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(self._db.execute(
+                f"SELECT key, {column} FROM embeddings WHERE key IN ({placeholders})", chunk))
+        return found
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Cached vector for each text, or None where the text has not been embedded yet."""
+        keys = [text_key(self.model_name, t) for t in texts]
+        found = self._select("vector", list(dict.fromkeys(keys)))
+        if found:
+            now = time.time()
+            self._db.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                 [(now, key) for key in found])
+            self._db.commit()
+        results = [np.frombuffer(found[k], dtype=np.float32) if k in found else None for k in keys]
+        hits = sum(r is not None for r in results)
+        self.hits += hits
+        self.misses += len(results) - hits
+        self._report()
+        return results
+
+    def put_many(self, texts: List[str], vectors: List[np.ndarray]):
+        now = time.time()
+        rows = {}
+        for text, vector in zip(texts, vectors):
+            rows[text_key(self.model_name, text)] = np.asarray(vector, dtype=np.float32).tobytes()
+        # Keys already present are replaced, so only count their size once
+        existing = self._select("LENGTH(vector)", list(rows))
+        self._db.executemany("INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                             [(key, vector, now) for key, vector in rows.items()])
+        self._db.commit()
+        self.size_bytes += sum(len(v) for v in rows.values()) - sum(existing.values())
+        if self.size_bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        target = int(self.max_bytes * CACHE_EVICT_TO)
+        freed, deleted = 0, []
+        for key, size in self._db.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used"):
+            if self.size_bytes - freed <= target:
+                break
+            deleted.append((key,))
+            freed += size
+        self._db.executemany("DELETE FROM embeddings WHERE key = ?", deleted)
+        self._db.commit()
+        self.size_bytes -= freed
+        self.evictions += len(deleted)
+        logger.info(f"Evicted {len(deleted)} cached embeddings, cache now {self.size_bytes / 2**20:.1f} MB")
+
+    def _report(self):
+        lookups = self.hits + self.misses
+        if lookups - self._reported >= CACHE_REPORT_EVERY:
+            self._reported = lookups
+            logger.info(f"Embedding cache: {self.hits}/{lookups} hits ({self.hit_rate:.1%}), "
+                        f"{self.evictions} evicted, {self.size_bytes / 2**20:.1f} MB")
+
+    def close(self):
+        self._db.close()
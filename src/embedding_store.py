@@ -0,0 +1,425 @@
+# python src/embedding_store.py
+
+import io
+import os
+import csv
+import glob
+import json
+import time
+import logging
+from typing import Optional
+
+import numpy as np
+
+from src.retrieval import l2_normalize
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Config
+# ---------------------------
+OUTPUT_DIR = os.environ.get("OUTPUT_DATA_DIR", "/app/data/output")
+INDEX_MANIFEST_PATH = os.path.join(OUTPUT_DIR, "index_manifest.json")
+EMBEDDING_DTYPE = np.float32
+# One row per chunk of a ticket: body holds the chunk text, chunk_no its position (0 for short tickets)
+METADATA_COLUMNS = ["ticket_id", "timestamp", "customer_id", "subject", "body", "chunk_no"]
+IDS_COLUMNS = ["ticket_id", "row", "time", "diff", "key"]  # key: Pathway row key, to resume after a restart
+# Rewrite the output once this share of the vector rows is retracted or superseded
+COMPACT_DEAD_RATIO = float(os.environ.get("INDEX_COMPACT_DEAD_RATIO", "0.5"))
+COMPACT_MIN_ROWS = int(os.environ.get("INDEX_COMPACT_MIN_ROWS", "1000"))
+COMPACT_BLOCK_ROWS = 65536
+
+# File names per generation; a compaction writes a new generation and swaps the manifest
+GENERATION_FILES = {
+    "metadata": "indexed_data.{generation}.csv",
+    "vectors": "embeddings.{generation}.f32",
+    "ids": "embeddings_ids.{generation}.csv",
+    # Fields of every vector row for readers that map the output (see src/shared_index.py):
+    # UTF-8 values back to back, and the int64 end offset of each value, one line per row
+    "records": "records.{generation}.bin",
+    "offsets": "records.{generation}.off",
+}
+# Liveness of the rows (one byte each) as of one snapshot version; written once, never modified
+ALIVE_FILE = "alive.{generation}.{version}.u8"
+RECORD_OFFSET_DTYPE = np.int64
+
+
+def read_manifest(manifest_path: str = INDEX_MANIFEST_PATH) -> Optional[dict]:
+    """Return the current index manifest or None if the pipeline has not written one yet."""
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(manifest: dict, manifest_path: str = INDEX_MANIFEST_PATH):
+    """Atomically replace the manifest."""
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def manifest_file(manifest: dict, name: str, manifest_path: str = INDEX_MANIFEST_PATH) -> str:
+    """Absolute path of one of the files named in the manifest ("metadata", "vectors", "ids", "alive", ...)."""
+    return os.path.join(os.path.dirname(manifest_path), manifest[name])
+
+
+def same_generation(a: Optional[dict], b: Optional[dict]) -> bool:
+    """True if both manifests describe the same output files (snapshot versions may differ)."""
+    if a is None or b is None:
+        return a is b
+    return (a["created"], a["generation"]) == (b["created"], b["generation"])
+
+
+def read_complete_csv(path: str):
+    """Header, rows and byte offsets of a CSV file, ignoring a partially written last record.
+
+    offsets[i] is where record i starts (offsets[0] is the end of the header),
+    and offsets[-1] where the complete records end.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    position, complete = 0, True
+
+    def lines():
+        nonlocal position, complete
+        for line in io.BytesIO(data):
+            position += len(line)
+            complete = line.endswith(b"\n")
+            yield line.decode("utf-8")
+
+    reader = csv.reader(lines())
+    header = next(reader, None)
+    offsets, rows = [position], []
+    for row in reader:
+        if not complete:
+            break
+        rows.append(row)
+        offsets.append(position)
+    return header, rows, offsets
+
+
+def map_vectors(vectors_path: str, dim: int, rows: int) -> np.ndarray:
+    """Memory-map the first `rows` vectors of the store (read-only, no copy)."""
+    row_bytes = dim * np.dtype(EMBEDDING_DTYPE).itemsize
+    available = os.path.getsize(vectors_path) // row_bytes if os.path.exists(vectors_path) else 0
+    rows = min(rows, available)
+    if rows == 0:
+        return np.empty((0, dim), dtype=EMBEDDING_DTYPE)
+    return np.memmap(vectors_path, dtype=EMBEDDING_DTYPE, mode="r", shape=(rows, dim))
+
+
+# ---------------------------
+# Writer (Pathway side)
+# ---------------------------
+class EmbeddingStoreWriter:
+    """Writes the pipeline output: ticket metadata CSV, float32 vectors and an id/offset sidecar.
+
+    Meant to be attached with ``pw.io.subscribe``. Both CSVs carry Pathway's
+    ``time`` and ``diff`` columns. Vectors are L2-normalized on append, so the
+    mapped matrix can be scored with a single matrix-vector product. Sidecar
+    rows are only written after the vectors they point to are flushed, so a
+    reader never sees an id referring past the end of the vector file.
+
+    The writer keeps the live rows of every ticket_id, one per chunk. A chunk
+    replaces the live chunk with the same chunk_no; an addition from a newer
+    Pathway time replaces all chunks of the ticket, so an edit that shortens a
+    ticket leaves no stale chunks behind. The output is compacted into a new
+    generation once too many rows are dead.
+
+    At the end of every Pathway time it also publishes a snapshot version: the
+    manifest is replaced with one naming the visible row count and a fresh
+    liveness file, after the record and vector files cover those rows. Readers
+    can map a snapshot as is, it never changes after publication.
+    """
+    def __init__(self, dim: int, manifest_path: str = INDEX_MANIFEST_PATH,
+                 metadata_columns=METADATA_COLUMNS, resume: bool = False):
+        """With `resume`, appends to the output of the previous run instead of starting a new generation.
+
+        Use it when Pathway restarts from persisted state: rows committed
+        before the restart are not sent again, so the output must be kept.
+        """
+        self.dim = dim
+        self.manifest_path = manifest_path
+        self.metadata_columns = list(metadata_columns)
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        previous = read_manifest(manifest_path)
+        self.generation = previous["generation"] + 1 if previous else 0
+        self.created = time.time()
+        self.version = 0
+        self._rows = {}  # Pathway key (as str) -> vector row, to resolve retractions
+        self._live = {}  # ticket_id -> {chunk_no: (vector row, metadata row)}
+        self._chunk_column = self.metadata_columns.index("chunk_no") if "chunk_no" in self.metadata_columns else None
+        self._alive = np.zeros(1024, dtype=bool)
+        self._pending_ids = []
+        self._pending_metadata = []
+        self._pending_records = []  # metadata rows of the vector rows not flushed yet
+        if resume and previous is not None and self._can_resume(previous):
+            self._resume(previous)
+        else:
+            if resume:
+                logger.warning("No index output to resume: tickets Pathway committed before the restart will "
+                               "be missing until the persistence directory is cleared and the input re-read")
+            self._open_generation()
+        self._publish()
+        self._remove_stale_generations()
+
+    # ---------------------------
+    # Files
+    # ---------------------------
+    def _path(self, name: str, generation: int) -> str:
+        return os.path.join(os.path.dirname(self.manifest_path),
+                            GENERATION_FILES[name].format(generation=generation))
+
+    def _open_generation(self):
+        self._vectors = open(self._path("vectors", self.generation), "wb")
+        self._ids_file = open(self._path("ids", self.generation), "w", newline="", encoding="utf-8")
+        self._ids = csv.writer(self._ids_file)
+        self._ids.writerow(IDS_COLUMNS)
+        self._metadata_file = open(self._path("metadata", self.generation), "w", newline="", encoding="utf-8")
+        self._metadata = csv.writer(self._metadata_file)
+        self._metadata.writerow(self.metadata_columns + ["time", "diff"])
+        self._records = open(self._path("records", self.generation), "wb")
+        self._offsets = open(self._path("offsets", self.generation), "wb")
+        self._records_end = 0
+        self._flush()
+        self._next_row = 0
+        self._alive[:] = False
+
+    def _can_resume(self, manifest: dict) -> bool:
+        if not all(os.path.exists(self._path(name, manifest["generation"])) for name in GENERATION_FILES):
+            return False
+        with open(self._path("ids", manifest["generation"]), newline="", encoding="utf-8") as f:
+            if next(csv.reader(f), None) != IDS_COLUMNS:  # older outputs have no Pathway keys
+                return False
+        # Outputs written with other columns (e.g. before chunking) are rebuilt from scratch
+        return manifest.get("record_columns") == self.metadata_columns + ["time", "diff"]
+
+    def _resume(self, manifest: dict):
+        """Reopen the previous run's generation for appending and rebuild the writer state from it.
+
+        The two CSVs get one line per change, written together, so they are
+        replayed pairwise. Whatever a crash left half-written past the last
+        complete change (a partial CSV line, vectors or record bytes without
+        their sidecar entry) is truncated away.
+        """
+        self.generation, self.created = manifest["generation"], manifest["created"]
+        self.version = manifest.get("version", 0)
+        ids_header, ids, ids_offsets = read_complete_csv(self._path("ids", self.generation))
+        meta_header, metadata, meta_offsets = read_complete_csv(self._path("metadata", self.generation))
+        row_bytes = self.dim * np.dtype(EMBEDDING_DTYPE).itemsize
+        vector_rows = os.path.getsize(self._path("vectors", self.generation)) // row_bytes
+        ncolumns = len(self.metadata_columns) + 2
+        offset_bytes = ncolumns * np.dtype(RECORD_OFFSET_DTYPE).itemsize
+        record_rows = os.path.getsize(self._path("offsets", self.generation)) // offset_bytes
+        self._next_row = 0
+        changes = 0
+        for id_line, meta_line in zip(ids, metadata):
+            entry, record = dict(zip(ids_header, id_line)), dict(zip(meta_header, meta_line))
+            metadata_row = [record[c] for c in self.metadata_columns] + [int(record["time"]), int(record["diff"])]
+            if int(entry["diff"]) > 0:
+                if self._next_row >= min(vector_rows, record_rows):
+                    break
+                self._add(entry.get("key", ""), entry["ticket_id"], metadata_row)
+            else:
+                self._retract(entry.get("key", ""), entry["ticket_id"])
+            changes += 1
+
+        rows = self._next_row
+        with open(self._path("offsets", self.generation), "rb") as f:
+            f.seek(max(rows - 1, 0) * offset_bytes)
+            ends = np.frombuffer(f.read(offset_bytes), dtype=RECORD_OFFSET_DTYPE)
+        self._records_end = int(ends[-1]) if rows else 0
+        for name, size in (("ids", ids_offsets[changes]), ("metadata", meta_offsets[changes]),
+                           ("vectors", rows * row_bytes), ("offsets", rows * offset_bytes),
+                           ("records", self._records_end)):
+            os.truncate(self._path(name, self.generation), size)
+
+        self._vectors = open(self._path("vectors", self.generation), "ab")
+        self._ids_file = open(self._path("ids", self.generation), "a", newline="", encoding="utf-8")
+        self._ids = csv.writer(self._ids_file)
+        self._metadata_file = open(self._path("metadata", self.generation), "a", newline="", encoding="utf-8")
+        self._metadata = csv.writer(self._metadata_file)
+        self._records = open(self._path("records", self.generation), "ab")
+        self._offsets = open(self._path("offsets", self.generation), "ab")
+        logger.info(f"Resumed index output generation {self.generation}: {rows} rows, "
+                    f"{len(self._live)} live tickets")
+
+    def _close_generation(self):
+        self._vectors.close()
+        self._ids_file.close()
+        self._metadata_file.close()
+        self._records.close()
+        self._offsets.close()
+
+    def _flush(self):
+        if self._pending_records:
+            blob, ends = bytearray(), []
+            for metadata_row in self._pending_records:
+                for value in metadata_row:
+                    blob += str(value).encode("utf-8")
+                    ends.append(self._records_end + len(blob))
+            self._records.write(blob)
+            self._offsets.write(np.array(ends, dtype=RECORD_OFFSET_DTYPE).tobytes())
+            self._records_end += len(blob)
+            self._pending_records = []
+        self._records.flush()
+        self._offsets.flush()
+        self._vectors.flush()
+        self._ids.writerows(self._pending_ids)
+        self._metadata.writerows(self._pending_metadata)
+        self._ids_file.flush()
+        self._metadata_file.flush()
+        self._pending_ids = []
+        self._pending_metadata = []
+
+    def _publish(self):
+        """Publish the flushed rows and their liveness as a new snapshot version."""
+        self.version += 1
+        alive_name = ALIVE_FILE.format(generation=self.generation, version=self.version)
+        alive_path = os.path.join(os.path.dirname(self.manifest_path), alive_name)
+        with open(alive_path + ".tmp", "wb") as f:
+            f.write(self._alive[:self._next_row].tobytes())
+        os.replace(alive_path + ".tmp", alive_path)
+        manifest = {
+            "dim": self.dim,
+            "dtype": np.dtype(EMBEDDING_DTYPE).name,
+            "normalized": True,
+            "created": self.created,
+            "generation": self.generation,
+            "version": self.version,
+            "rows": self._next_row,
+            "record_columns": self.metadata_columns + ["time", "diff"],
+            "alive": alive_name,
+        }
+        for name, pattern in GENERATION_FILES.items():
+            manifest[name] = pattern.format(generation=self.generation)
+        write_manifest(manifest, self.manifest_path)
+        self._remove_stale_alive_files()
+
+    def _remove_stale_alive_files(self):
+        # The previous version is kept for readers that read the manifest just before it was replaced;
+        # readers that mapped an older file keep their mapping after it is unlinked
+        keep = {ALIVE_FILE.format(generation=self.generation, version=v) for v in (self.version, self.version - 1)}
+        out_dir = os.path.dirname(self.manifest_path)
+        for path in glob.glob(os.path.join(out_dir, ALIVE_FILE.format(generation="*", version="*"))):
+            if os.path.basename(path) not in keep:
+                os.remove(path)
+
+    def _remove_stale_generations(self):
+        current = {self._path(name, self.generation) for name in GENERATION_FILES}
+        out_dir = os.path.dirname(self.manifest_path)
+        for pattern in GENERATION_FILES.values():
+            for path in glob.glob(os.path.join(out_dir, pattern.format(generation="*"))):
+                if path not in current:
+                    os.remove(path)
+
+    # ---------------------------
+    # Pathway callbacks
+    # ---------------------------
+    def on_change(self, key, row: dict, time: int, is_addition: bool):
+        ticket_id = row["ticket_id"]
+        metadata_row = [row[c] for c in self.metadata_columns] + [time, 1 if is_addition else -1]
+        if is_addition:
+            vector = l2_normalize(row["embedding"])
+            if vector.shape != (self.dim,):
+                raise ValueError(f"Expected embedding of shape ({self.dim},), got {vector.shape}")
+            self._vectors.write(vector.tobytes())
+            row_no = self._add(str(key), ticket_id, metadata_row)
+            self._pending_ids.append([ticket_id, row_no, time, 1, str(key)])
+            self._pending_records.append(metadata_row)
+        else:
+            row_no = self._retract(str(key), ticket_id)
+            self._pending_ids.append([ticket_id, row_no, time, -1, str(key)])
+        self._pending_metadata.append(metadata_row)
+
+    def _add(self, key: str, ticket_id: str, metadata_row: list) -> int:
+        """Make the next vector row a live chunk of `ticket_id`; returns that row."""
+        row_no = self._next_row
+        self._next_row += 1
+        self._rows[key] = row_no
+        chunk_no = 0 if self._chunk_column is None else int(metadata_row[self._chunk_column])
+        chunks = self._live.setdefault(ticket_id, {})
+        if chunks and next(iter(chunks.values()))[1][-2] != metadata_row[-2]:
+            # A newer version of the ticket: none of the old chunks stay live
+            for previous, _ in chunks.values():
+                self._alive[previous] = False
+            chunks.clear()
+        previous = chunks.get(chunk_no)
+        if previous is not None:
+            self._alive[previous[0]] = False
+        chunks[chunk_no] = (row_no, metadata_row)
+        self._set_alive(row_no)
+        return row_no
+
+    def _retract(self, key: str, ticket_id: str) -> int:
+        """Kill the row added under `key`; returns it, -1 if unknown."""
+        row_no = self._rows.pop(key, -1)
+        chunks = self._live.get(ticket_id, {})
+        for chunk_no, (live_row, _) in list(chunks.items()):
+            if live_row == row_no:
+                del chunks[chunk_no]
+        if not chunks:
+            self._live.pop(ticket_id, None)
+        if row_no >= 0:
+            self._alive[row_no] = False
+        return row_no
+
+    def _set_alive(self, row_no: int):
+        if row_no >= len(self._alive):
+            alive = np.zeros(max(row_no + 1, 2 * len(self._alive)), dtype=bool)
+            alive[:len(self._alive)] = self._alive
+            self._alive = alive
+        self._alive[row_no] = True
+
+    def on_time_end(self, time: int):
+        if not self._pending_ids:
+            return
+        self._flush()
+        dead = self._next_row - int(np.count_nonzero(self._alive[:self._next_row]))
+        if self._next_row >= COMPACT_MIN_ROWS and dead > COMPACT_DEAD_RATIO * self._next_row:
+            self.compact()
+        else:
+            self._publish()
+
+    def on_end(self):
+        self._flush()
+        self._close_generation()
+
+    # ---------------------------
+    # Compaction
+    # ---------------------------
+    def compact(self):
+        """Rewrite the output with only the live rows and publish it as a new generation."""
+        self._flush()
+        old_rows = self._next_row
+        old_vectors = map_vectors(self._path("vectors", self.generation), self.dim, old_rows)
+        self._close_generation()
+
+        live = sorted(((ticket_id, chunk_no, entry) for ticket_id, chunks in self._live.items()
+                       for chunk_no, entry in chunks.items()), key=lambda item: item[2][0])
+        keys = {row: key for key, row in self._rows.items()}
+        self.generation += 1
+        self._open_generation()
+        remap = {}
+        for start in range(0, len(live), COMPACT_BLOCK_ROWS):
+            block = live[start:start + COMPACT_BLOCK_ROWS]
+            rows = np.fromiter((old_row for _, _, (old_row, _) in block), dtype=np.int64, count=len(block))
+            self._vectors.write(np.ascontiguousarray(old_vectors[rows]).tobytes())
+            for ticket_id, chunk_no, (old_row, metadata_row) in block:
+                new_row = self._next_row
+                self._next_row += 1
+                remap[old_row] = new_row
+                self._live[ticket_id][chunk_no] = (new_row, metadata_row)
+                self._set_alive(new_row)
+                # Keep the original time so readers can still join the sidecar with the metadata
+                self._pending_ids.append([ticket_id, new_row, metadata_row[-2], 1, keys.get(old_row, "")])
+                self._pending_metadata.append(metadata_row)
+                self._pending_records.append(metadata_row)
+        self._rows = {key: remap[row] for key, row in self._rows.items() if row in remap}
+        self._flush()
+        del old_vectors
+        self._publish()
+        self._remove_stale_generations()
+        logger.info(f"Compacted index from {old_rows} to {self._next_row} rows (generation {self.generation})")
@@ -0,0 +1,191 @@
+# python src/index_tail.py
+
+import os
+import io
+import csv
+import logging
+from collections import defaultdict, deque
+from typing import List, Optional
+
+import numpy as np
+
+from src.embedding_store import INDEX_MANIFEST_PATH, manifest_file, map_vectors, read_manifest, same_generation
+
+logger = logging.getLogger(__name__)
+
+INT_COLUMNS = ("row", "time", "diff", "chunk_no")
+
+
+def _last_record_end(data: bytes) -> int:
+    """Offset just past the last complete CSV record in `data` (newline outside quotes)."""
+    end = data.rfind(b"\n") + 1
+    while end > 0 and data.count(b'"', 0, end) % 2:
+        end = data.rfind(b"\n", 0, end - 1) + 1
+    return end
+
+
+class CsvTail:
+    """Reads the rows appended to a CSV file since the previous call.
+
+    Only complete records are consumed; a partially written last line is left
+    for the next call. The byte offset is remembered between calls.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.reset()
+
+    def reset(self):
+        self.offset = 0
+        self.header = None
+        self._inode = None
+
+    def rotated(self) -> bool:
+        """True if the file was truncated or replaced since it was last read."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return self.offset > 0
+        if self._inode is not None and st.st_ino != self._inode:
+            return True
+        return st.st_size < self.offset
+
+    def read_new(self) -> List[dict]:
+        try:
+            with open(self.path, "rb") as f:
+                self._inode = os.fstat(f.fileno()).st_ino
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        end = _last_record_end(data)
+        if end == 0:
+            return []
+        self.offset += end
+        lines = list(csv.reader(io.StringIO(data[:end].decode("utf-8"))))
+        if self.header is None:
+            self.header, lines = lines[0], lines[1:]
+        rows = []
+        for line in lines:
+            if not line:
+                continue
+            row = dict(zip(self.header, line))
+            for col in INT_COLUMNS:
+                if col in row:
+                    row[col] = int(row[col])
+            rows.append(row)
+        return rows
+
+
+class IndexTail:
+    """Incremental reader for the pipeline output described by the index manifest.
+
+    Vector rows from the store sidecar are matched with their metadata rows in
+    the CSV by (ticket_id, time), which the writer records identically in both.
+    Sidecar entries are applied in order with the writer's rules: an addition
+    supersedes the live chunk of its ticket_id with the same chunk_no, or all
+    of its chunks if they are from an older Pathway time; a retraction kills
+    the row it names. Rows become visible once both halves have been written.
+    """
+    def __init__(self, manifest_path: str = INDEX_MANIFEST_PATH):
+        self.manifest_path = manifest_path
+        self.reset()
+
+    def reset(self):
+        self.manifest = None
+        self._meta_tail = None
+        self._ids_tail = None
+        self.rows = 0
+        self.live = {}  # ticket_id -> live row of its first chunk
+        self._chunks = {}  # ticket_id -> (time, {chunk_no: live row})
+        self._alive = np.zeros(1024, dtype=bool)
+        self._pending = deque()  # sidecar entries not applied yet
+        self._unmatched = defaultdict(deque)  # (ticket_id, time) -> metadata records
+
+    def needs_reset(self) -> bool:
+        """True if the pipeline restarted or compacted the output into a new generation."""
+        if self.manifest is None:
+            return False
+        if not same_generation(read_manifest(self.manifest_path), self.manifest):
+            return True
+        return self._meta_tail.rotated() or self._ids_tail.rotated()
+
+    def poll(self) -> List[dict]:
+        """Return metadata records for store rows that became visible since the last poll."""
+        if self.manifest is None:
+            self.manifest = read_manifest(self.manifest_path)
+            if self.manifest is None:
+                return []
+            self._meta_tail = CsvTail(manifest_file(self.manifest, "metadata", self.manifest_path))
+            self._ids_tail = CsvTail(manifest_file(self.manifest, "ids", self.manifest_path))
+        self._pending.extend(self._ids_tail.read_new())
+        for record in self._meta_tail.read_new():
+            # Retractions are taken from the sidecar, which names the exact row
+            if record["diff"] > 0:
+                self._unmatched[(record["ticket_id"], record["time"])].append(record)
+
+        new_records = []
+        while self._pending:
+            entry = self._pending[0]
+            if entry["diff"] < 0:
+                self._retract(entry)
+            else:
+                key = (entry["ticket_id"], entry["time"])
+                if not self._unmatched.get(key):
+                    break
+                record = self._unmatched[key].popleft()
+                if not self._unmatched[key]:
+                    del self._unmatched[key]
+                self._append(entry, record.get("chunk_no", 0))
+                new_records.append(record)
+            self._pending.popleft()
+        return new_records
+
+    def _append(self, entry: dict, chunk_no: int):
+        if entry["row"] != self.rows:
+            logger.warning(f"Embedding store row {entry['row']} out of order, expected {self.rows}")
+        if self.rows == len(self._alive):
+            self._alive = np.concatenate([self._alive, np.zeros(len(self._alive), dtype=bool)])
+        ticket_id = entry["ticket_id"]
+        time, chunks = self._chunks.get(ticket_id, (entry["time"], {}))
+        if time != entry["time"]:
+            for previous in chunks.values():
+                self._alive[previous] = False
+            chunks = {}
+        previous = chunks.get(chunk_no)
+        if previous is not None:
+            self._alive[previous] = False
+        chunks[chunk_no] = self.rows
+        self._chunks[ticket_id] = (entry["time"], chunks)
+        self.live[ticket_id] = chunks[min(chunks)]
+        self._alive[self.rows] = True
+        self.rows += 1
+
+    def _retract(self, entry: dict):
+        row = entry["row"]
+        if not 0 <= row < self.rows:
+            return
+        self._alive[row] = False
+        ticket_id = entry["ticket_id"]
+        time, chunks = self._chunks.get(ticket_id, (None, {}))
+        for chunk_no, live_row in list(chunks.items()):
+            if live_row == row:
+                del chunks[chunk_no]
+        if chunks:
+            self.live[ticket_id] = chunks[min(chunks)]
+        else:
+            self._chunks.pop(ticket_id, None)
+            self.live.pop(ticket_id, None)
+
+    def alive(self) -> np.ndarray:
+        """Boolean mask over the visible rows, False for retracted or superseded rows.
+
+        A copy: later polls flip rows of the internal mask in place.
+        """
+        return self._alive[:self.rows].copy()
+
+    def vectors(self) -> Optional[np.ndarray]:
+        """Memory-mapped matrix covering exactly the visible rows."""
+        if self.manifest is None:
+            return None
+        return map_vectors(manifest_file(self.manifest, "vectors", self.manifest_path),
+                           self.manifest["dim"], self.rows)
@@ -0,0 +1,111 @@
+# python src/index_watcher.py
+
+import os
+import time
+import ctypes
+import select
+import struct
+import logging
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Config
+# ---------------------------
+POLL_SECONDS = 0.05  # manifest stat interval where inotify is not available
+
+# <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len (name follows)
+
+
+def _inotify_watch(directory: str) -> Optional[int]:
+    """inotify descriptor reporting files written or renamed into `directory`, None where unsupported."""
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _event_names(data: bytes):
+    offset = 0
+    while offset + EVENT_HEADER.size <= len(data):
+        _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+        offset += EVENT_HEADER.size
+        yield data[offset:offset + length].rstrip(b"\0").decode("utf-8", "replace")
+        offset += length
+
+
+class ManifestWatcher:
+    """Calls `on_change` in a daemon thread as soon as the index manifest is replaced.
+
+    The pipeline publishes every snapshot version by renaming a new manifest
+    into place, so watching that one file is enough to learn about updates.
+    On Linux the directory is watched with inotify and the thread sleeps until
+    the rename; elsewhere (or while the directory does not exist) the file's
+    inode and mtime are checked every POLL_SECONDS. `on_change` also runs at
+    least every `max_interval` seconds as a safety net.
+    """
+    def __init__(self, manifest_path: str, on_change: Callable[[], object], max_interval: float):
+        self.manifest_path = manifest_path
+        self.on_change = on_change
+        self.max_interval = max_interval
+        self.changes = 0
+
+    def start(self):
+        threading.Thread(target=self._run, name="index-watcher", daemon=True).start()
+
+    def _signature(self):
+        try:
+            st = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def _wait_inotify(self, fd: int, name: str, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while True:
+            ready, _, _ = select.select([fd], [], [], max(0.0, deadline - time.monotonic()))
+            if not ready:
+                return False
+            try:
+                data = os.read(fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            if name in _event_names(data):
+                return True
+
+    def _run(self):
+        directory, name = os.path.split(self.manifest_path)
+        fd = _inotify_watch(directory) if os.path.isdir(directory) else None
+        if fd is None:
+            logger.info(f"Watching {self.manifest_path} by polling every {POLL_SECONDS}s")
+        last_signature, last_run = self._signature(), time.monotonic()
+        while True:
+            if fd is not None:
+                changed = self._wait_inotify(fd, name, self.max_interval)
+            else:
+                time.sleep(POLL_SECONDS)
+                signature = self._signature()
+                changed, last_signature = signature != last_signature, signature
+            if not changed and time.monotonic() - last_run < self.max_interval:
+                continue
+            self.changes += changed
+            last_run = time.monotonic()
+            try:
+                self.on_change()
+            except Exception as e:
+                logger.error(f"Index refresh after manifest change failed: {e}", exc_info=True)
@@ -0,0 +1,95 @@
+# python src/lexical_index.py
+
+import re
+import math
+from typing import List, Optional
+
+import numpy as np
+
+from src.metadata_index import AppendOnlyArray
+from src.retrieval import top_k
+
+# ---------------------------
+# Config
+# ---------------------------
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Terms found in more than this share of the rows carry almost no signal and have huge postings
+MAX_DF_RATIO = 0.5
+
+# Words, numbers and hyphenated identifiers such as "tkt-000123" or "e503"
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms of `text`; hyphenated identifiers are kept whole and also split into parts."""
+    terms = []
+    for token in TOKEN_RE.findall((text or "").lower()):
+        terms.append(token)
+        if "-" in token or "_" in token:
+            terms.extend(re.split(r"[-_]", token))
+    return terms
+
+
+class LexicalIndex:
+    """Incremental BM25 inverted index over the subject and body of every row.
+
+    Rows are appended as the engine picks them up from the pipeline output, with
+    the same row ids as the embedding matrix. Postings are only ever appended,
+    so dead rows stay in the document frequencies; `search` drops them with the
+    liveness mask, like the vector search does.
+    """
+    def __init__(self, fields=("subject", "body")):
+        self.fields = fields
+        self.rows = 0
+        self.total_length = 0
+        self._postings = {}  # term -> (rows, term frequencies)
+        self._lengths = AppendOnlyArray(np.float32)
+
+    def extend(self, records: List[dict]):
+        for record in records:
+            terms = tokenize(" ".join(str(record.get(f) or "") for f in self.fields))
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, count in counts.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = (AppendOnlyArray(), AppendOnlyArray(np.int32))
+                postings[0].append(self.rows)
+                postings[1].append(count)
+            self._lengths.append(len(terms))
+            self.total_length += len(terms)
+            self.rows += 1
+
+    def search(self, query: str, k: int, rows: int, mask: Optional[np.ndarray] = None):
+        """BM25 top-k among the first `rows` rows where `mask` is True. Returns (indices, scores), best first."""
+        n = min(rows, self.rows)
+        if n == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        lengths = self._lengths.array()[:n]
+        avg_length = max(self.total_length / self.rows, 1.0)
+        hit_rows, hit_scores = [], []
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            term_rows, term_tfs = postings[0].array(), postings[1].array()
+            df = min(len(term_rows), len(term_tfs))  # a concurrent extend may have appended only one
+            if n > 10 and df > MAX_DF_RATIO * n:
+                continue
+            visible = np.searchsorted(term_rows[:df], n)
+            term_rows, term_tfs = term_rows[:visible], term_tfs[:visible].astype(np.float32)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[term_rows] / avg_length)
+            hit_rows.append(term_rows)
+            hit_scores.append(idf * term_tfs * (BM25_K1 + 1) / (term_tfs + norm))
+        if not hit_rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        unique_rows, inverse = np.unique(np.concatenate(hit_rows), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(hit_scores)).astype(np.float32)
+        if mask is not None:
+            keep = mask[unique_rows]
+            unique_rows, scores = unique_rows[keep], scores[keep]
+        best = top_k(scores, k)
+        return unique_rows[best], scores[best]
@@ -0,0 +1,182 @@
+# python src/metadata_index.py
+
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import numpy as np
+
+
+def parse_timestamp(value) -> float:
+    """Seconds since the epoch for an ISO-8601 string (naive times are taken as UTC), NaN if unparseable."""
+    if value is None or value == "":
+        return np.nan
+    try:
+        parsed = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    except ValueError:
+        return np.nan
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class AppendOnlyArray:
+    """Growable, append-only NumPy array (row ids, counts). `array()` is a view of the filled part."""
+    def __init__(self, dtype=np.int64):
+        self._values = np.empty(16, dtype=dtype)
+        self.count = 0
+
+    def append(self, value):
+        if self.count == len(self._values):
+            values = np.empty(2 * len(self._values), dtype=self._values.dtype)
+            values[:self.count] = self._values
+            self._values = values
+        self._values[self.count] = value
+        self.count += 1
+
+    def array(self) -> np.ndarray:
+        return self._values[:self.count]
+
+
+class MetadataIndex:
+    """Column and search indexes over the ticket metadata, one entry per embedding row.
+
+    customer_id is dictionary-encoded into an int32 column and timestamp is parsed
+    once into a float64 column, so a filter can be applied as a mask over the
+    visible rows (post-filtering). For pre-filtering, the index also keeps an
+    inverted index customer_id -> row ids and the timestamps sorted with their
+    rows, so the rows matching a filter can be listed without touching the others.
+    Everything is only appended to or replaced, so a reader can keep using the
+    arrays it read while rows are added.
+    """
+    def __init__(self):
+        self.rows = 0
+        self.customer_codes = {}  # customer_id -> code
+        self.customer_rows = {}  # customer_id -> AppendOnlyArray, ascending
+        self._customers = np.empty(1024, dtype=np.int32)
+        self._timestamps = np.empty(1024, dtype=np.float64)
+        # (parseable timestamps ascending, row of each), swapped as one pair
+        self._sorted = (np.empty(0, dtype=np.float64), np.empty(0, dtype=np.int64))
+
+    def extend(self, records: List[dict]):
+        end = self.rows + len(records)
+        if end > len(self._customers):
+            capacity = max(end, 2 * len(self._customers))
+            customers = np.empty(capacity, dtype=np.int32)
+            customers[:self.rows] = self._customers[:self.rows]
+            timestamps = np.empty(capacity, dtype=np.float64)
+            timestamps[:self.rows] = self._timestamps[:self.rows]
+            self._customers, self._timestamps = customers, timestamps
+        for i, record in enumerate(records, self.rows):
+            customer_id = record.get("customer_id")
+            code = self.customer_codes.setdefault(customer_id, len(self.customer_codes))
+            self._customers[i] = code
+            self._timestamps[i] = parse_timestamp(record.get("timestamp"))
+            rows = self.customer_rows.get(customer_id)
+            if rows is None:
+                rows = self.customer_rows[customer_id] = AppendOnlyArray()
+            rows.append(i)
+        self._merge_sorted_times(self.rows, end)
+        self.rows = end
+
+    def _merge_sorted_times(self, start: int, end: int):
+        times = self._timestamps[start:end]
+        new_rows = np.arange(start, end, dtype=np.int64)[~np.isnan(times)]
+        if not len(new_rows):
+            return
+        order = np.argsort(self._timestamps[new_rows], kind="stable")
+        new_rows = new_rows[order]
+        new_times = self._timestamps[new_rows]
+        sorted_times, sorted_rows = self._sorted
+        # Tickets mostly arrive in time order, so this is usually a plain append
+        positions = np.searchsorted(sorted_times, new_times, side="right")
+        self._sorted = (np.insert(sorted_times, positions, new_times), np.insert(sorted_rows, positions, new_rows))
+
+    @staticmethod
+    def _time_range(sorted_times: np.ndarray, since: Optional[float], until: Optional[float]):
+        """Slice of the sorted timestamps within [since, until]."""
+        lo = 0 if since is None else np.searchsorted(sorted_times, since, side="left")
+        hi = len(sorted_times) if until is None else np.searchsorted(sorted_times, until, side="right")
+        return lo, max(lo, hi)
+
+    def estimate(self, customer_id: Optional[str] = None,
+                 since: Optional[float] = None, until: Optional[float] = None) -> int:
+        """Upper bound on the rows matching the filters, in O(log n)."""
+        estimate = self.rows
+        if customer_id is not None:
+            rows = self.customer_rows.get(customer_id)
+            estimate = min(estimate, rows.count if rows is not None else 0)
+        if since is not None or until is not None:
+            lo, hi = self._time_range(self._sorted[0], since, until)
+            estimate = min(estimate, hi - lo)
+        return estimate
+
+    def candidates(self, rows: int, customer_id: Optional[str] = None,
+                   since: Optional[float] = None, until: Optional[float] = None) -> np.ndarray:
+        """Ascending ids of the rows below `rows` matching all given filters.
+
+        Starts from the smaller of the customer posting list and the timestamp
+        range and checks the other filter against its column.
+        """
+        rows = min(rows, self.rows)
+        customer_rows = None
+        if customer_id is not None:
+            postings = self.customer_rows.get(customer_id)
+            if postings is None:
+                return np.empty(0, dtype=np.int64)
+            customer_rows = postings.array()
+            customer_rows = customer_rows[:np.searchsorted(customer_rows, rows)]
+        has_range = since is not None or until is not None
+        sorted_times, sorted_rows = self._sorted
+        if has_range:
+            lo, hi = self._time_range(sorted_times, since, until)
+        if customer_rows is not None and (not has_range or len(customer_rows) <= hi - lo):
+            result = customer_rows
+            if has_range:
+                times = self._timestamps[result]
+                keep = np.ones(len(result), dtype=bool)
+                if since is not None:
+                    keep &= times >= since
+                if until is not None:
+                    keep &= times <= until
+                result = result[keep]
+            return result
+        if not has_range:
+            return np.arange(rows, dtype=np.int64)
+        result = np.sort(sorted_rows[lo:hi])
+        result = result[:np.searchsorted(result, rows)]
+        if customer_id is not None:
+            result = result[self._customers[result] == self.customer_codes[customer_id]]
+        return result
+
+    def matches(self, rows: np.ndarray, customer_id: Optional[str] = None,
+                since: Optional[float] = None, until: Optional[float] = None) -> np.ndarray:
+        """For each id in `rows`, whether that row matches all given filters."""
+        keep = rows < self.rows
+        rows = np.where(keep, rows, 0)
+        if customer_id is not None:
+            keep &= self._customers[rows] == self.customer_codes.get(customer_id, -1)
+        if since is not None:
+            keep &= self._timestamps[rows] >= since
+        if until is not None:
+            keep &= self._timestamps[rows] <= until
+        return keep
+
+    def mask(self, rows: int, customer_id: Optional[str] = None,
+             since: Optional[float] = None, until: Optional[float] = None) -> Optional[np.ndarray]:
+        """Boolean mask over the first `rows` rows matching all given filters, None if no filter is set."""
+        if customer_id is None and since is None and until is None:
+            return None
+        rows = min(rows, self.rows)
+        customers, timestamps = self._customers, self._timestamps
+        mask = np.ones(rows, dtype=bool)
+        if customer_id is not None:
+            code = self.customer_codes.get(customer_id)
+            if code is None:
+                return np.zeros(rows, dtype=bool)
+            mask &= customers[:rows] == code
+        # NaN timestamps compare False, so rows without a parseable time never match a range
+        if since is not None:
+            mask &= timestamps[:rows] >= since
+        if until is not None:
+            mask &= timestamps[:rows] <= until
+        return mask
@@ -1,14 +1,20 @@
 # python src/pathway_pipeline.py
 
 import pathway as pw
-from sentence_transformers import SentenceTransformer # can use 'from pathway.xpacks.llm.embedders import OpenAIEmbedder'
-import pandas as pd
+import numpy as np
 import os
-from typing import List
+import logging
+from typing import List, Optional, Tuple
 
 from src import config
+from src.embedding_store import EmbeddingStoreWriter, OUTPUT_DIR
+from src.chunking import split_text
+from src.document_source import DocumentDirectorySubject, DocumentSchema, IngestMetrics
+from src.embedding_cache import EmbeddingCache
+from src.micro_batcher import MicroBatcher
 
-OUTPUT_CSV_PATH = "/app/data/output/indexed_data.csv"
+# Surface index writer, embedding cache and ingestion reports (compactions, hit rate, throughput) in the pipeline log
+logging.basicConfig(level=logging.INFO)
 
 class TicketSchema(pw.Schema):
     ticket_id: str
@@ -17,70 +23,198 @@ class TicketSchema(pw.Schema):
     subject: str
     body: str
 
-print(f"Loading embedding model: {config.EMBEDDING_MODEL_NAME}...")
-embedding_model = SentenceTransformer(config.EMBEDDING_MODEL_NAME)   # can use 'from pathway.xpacks.llm.embedders import OpenAIEmbedder'
-print("Model loaded.")
-
-# Modify the UDF to operate on column inputs, not DataFrames
-class EmbedderForRow:
-    def __init__(self, model):
+# Row-level UDF that shares forward passes: Pathway starts async UDFs for all rows of a
+# minibatch concurrently, and the micro-batcher encodes whatever arrives together in one call
+class EmbedderForRow(pw.UDF):
+    def __init__(self, model, max_batch_size: int, max_wait: float, cache: Optional[EmbeddingCache] = None,
+                 cache_strategy=None):
+        super().__init__(executor=pw.udfs.async_executor(capacity=4 * max_batch_size), cache_strategy=cache_strategy)
         self.model = model
-
-    # __call__ now takes individual column values from a row
-    def __call__(self, subject: str, body: str) -> str:
-        # Process a single row's data
+        self.cache = cache
+        self.batcher = MicroBatcher(self._encode_batch, max_batch_size=max_batch_size,
+                                    max_wait=max_wait, name="embedding-batcher")
+
+    def _encode(self, texts: List[str]) -> List[np.ndarray]:
+        vectors = self.model.encode(texts, batch_size=len(texts), show_progress_bar=False)
+        # Keep the raw float32 vectors; they are written to the binary embedding store
+        return list(np.asarray(vectors, dtype=np.float32))
+
+    def _encode_batch(self, texts: List[str]) -> List[np.ndarray]:
+        if self.cache is None:
+            return self._encode(texts)
+        # Only encode texts not seen before (re-read files, replays, duplicates in the batch)
+        vectors = self.cache.get_many(texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            encoded = dict(zip(missing, self._encode(missing)))
+            self.cache.put_many(missing, list(encoded.values()))
+            vectors = [encoded[t] if v is None else v for t, v in zip(texts, vectors)]
+        return vectors
+
+    # __wrapped__ takes individual column values from a row (body is one chunk of the ticket body)
+    async def __wrapped__(self, subject: str, body: str) -> np.ndarray:
         subject = subject or ''
         body = body or ''
         full_text = subject + " \n " + body
-        # Encode expects a list, even if it's just one item
-        embedding_vector = self.model.encode([full_text], show_progress_bar=False)[0]
-        # Return the string representation of the list for this single row
-        return str(embedding_vector.tolist())
-
-# Wrap the row-based embedder
-compute_embedding_for_row = pw.udf(EmbedderForRow(embedding_model))
-
-print(f"Setting up Pathway pipeline to monitor: {config.INPUT_DATA_DIR}")
-
-tickets_raw = pw.io.fs.read(
-    config.INPUT_DATA_DIR,
-    schema=TicketSchema,
-    format="csv",
-    mode="streaming",
-    with_metadata=True,
-    csv_settings=pw.io.csv.CsvParserSettings(delimiter=',')
-)
-
-# Use with_columns to apply the row-based UDF
-enriched_tickets = tickets_raw.with_columns(
-    # Pass the relevant columns for the current row (pw.this) to the UDF
-    embedding_str=compute_embedding_for_row(pw.this.subject, pw.this.body)
-)
-
-print(f"Configuring CSV writer to: {OUTPUT_CSV_PATH}")
-
-# --- Explicitly select ONLY the columns needed for the CSV output ---
-output_table = enriched_tickets.select(
-    pw.this.ticket_id,
-    pw.this.timestamp,
-    pw.this.customer_id,
-    pw.this.subject,
-    pw.this.body,
-    pw.this.embedding_str # The embedding string column
-)
-# -------------------------------------------------------------------
-
-print(f"Configuring CSV writer to: {OUTPUT_CSV_PATH}")
-
-# Write the selected table, not the one with potential extra columns
-pw.io.csv.write(
-    output_table,
-    OUTPUT_CSV_PATH
-)
-
-print("Starting Pathway pipeline processing loop...")
-pw.run()
-print("Pathway pipeline finished.")
+        return await self.batcher.acall(full_text)
+
+# Chunking: a body longer than the model's input window is split into overlapping chunks,
+# one row each, so no part of it is truncated away. Every chunk keeps the ticket's fields and
+# is identified by (ticket_id, chunk_no); short bodies stay a single chunk 0.
+@pw.udf
+def chunk_body(body: str) -> List[Tuple[int, str]]:
+    return list(enumerate(split_text(body)))
+
+
+def extension_glob(directory: str, extension: str) -> str:
+    """Pattern matching files with `extension` anywhere under `directory`, in any letter case (.csv, .CSV)."""
+    any_case = "".join(f"[{c.lower()}{c.upper()}]" if c.isalpha() else c for c in extension)
+    return os.path.join(directory, "**", "*" + any_case)
+
+
+def count_rows(metrics: IngestMetrics, fmt: str):
+    """pw.io.subscribe callback counting the rows a ticket reader adds."""
+    def on_change(key, row: dict, time: int, is_addition: bool):
+        if is_addition:
+            metrics.record(fmt, rows=1)
+    return on_change
+
+
+# The pipeline is built inside a function: the document parser workers are spawned
+# processes that import this module, and must not load the model or start Pathway
+def run_pathway_pipeline():
+    from sentence_transformers import SentenceTransformer  # imported here so parser workers do not load torch
+
+    print(f"Loading embedding model: {config.EMBEDDING_MODEL_NAME}...")
+    embedding_model = SentenceTransformer(config.EMBEDDING_MODEL_NAME)   # can use 'from pathway.xpacks.llm.embedders import OpenAIEmbedder'
+    print("Model loaded.")
+
+    # With persistence, a restart resumes from the committed input offsets. Pathway replays the
+    # persisted input through the graph but does not resend rows already committed to the
+    # subscribers; the UDF results are kept in the persistence directory, so nothing is re-embedded.
+    persistence_config = None
+    resume_output = False
+    if config.PERSISTENCE_DIR:
+        resume_output = os.path.isdir(config.PERSISTENCE_DIR) and bool(os.listdir(config.PERSISTENCE_DIR))
+        persistence_config = pw.persistence.Config.simple_config(
+            pw.persistence.Backend.filesystem(config.PERSISTENCE_DIR),
+            snapshot_interval_ms=config.PERSISTENCE_SNAPSHOT_INTERVAL_MS,
+        )
+        print(f"Pathway persistence in {config.PERSISTENCE_DIR} ({'resuming' if resume_output else 'fresh start'})")
+
+    embedding_cache = None
+    if config.EMBED_CACHE_PATH:
+        embedding_cache = EmbeddingCache(config.EMBED_CACHE_PATH, config.EMBEDDING_MODEL_NAME,
+                                         max_bytes=int(config.EMBED_CACHE_MAX_MB * 2**20))
+
+    compute_embedding_for_row = EmbedderForRow(
+        embedding_model,
+        max_batch_size=config.EMBED_BATCH_SIZE,
+        max_wait=config.EMBED_BATCH_MAX_WAIT_MS / 1000,
+        cache=embedding_cache,
+        cache_strategy=pw.udfs.DiskCache() if persistence_config is not None else None,
+    )
+
+    print(f"Setting up Pathway pipeline to monitor: {config.INPUT_DATA_DIR}")
+
+    # Input files are read by extension, in any letter case and in subdirectories too: CSV and JSON
+    # Lines tickets by Pathway's connectors, documents (PDF, Parquet, text) by the parser pool. All end up in one ticket-shaped table.
+    ingest_metrics = IngestMetrics()
+
+    csv_tickets = pw.io.fs.read(
+        extension_glob(config.INPUT_DATA_DIR, ".csv"),
+        schema=TicketSchema,
+        format="csv",
+        mode="streaming",
+        persistent_id="tickets" if persistence_config is not None else None,
+        with_metadata=True,
+        csv_settings=pw.io.csv.CsvParserSettings(delimiter=','),
+        autocommit_duration_ms=config.INPUT_AUTOCOMMIT_MS,
+    )
+
+    jsonl_tickets = pw.io.fs.read(
+        extension_glob(config.INPUT_DATA_DIR, ".jsonl"),
+        schema=TicketSchema,
+        format="json",
+        mode="streaming",
+        persistent_id="tickets-jsonl" if persistence_config is not None else None,
+        autocommit_duration_ms=config.INPUT_AUTOCOMMIT_MS,
+    )
+
+    ticket_sources = [csv_tickets.without(pw.this._metadata), jsonl_tickets]
+    pw.io.subscribe(csv_tickets, on_change=count_rows(ingest_metrics, "csv"))
+    pw.io.subscribe(jsonl_tickets, on_change=count_rows(ingest_metrics, "jsonl"))
+
+    if config.INGEST_PARSE_WORKERS > 0:
+        # Parsed outside the engine: Pathway keeps committing CSV/JSONL rows while a large PDF is parsed.
+        # Documents are re-parsed after a restart; their embeddings come from the caches.
+        documents = pw.io.python.read(
+            DocumentDirectorySubject(config.INPUT_DATA_DIR, config.INGEST_PARSE_WORKERS, ingest_metrics),
+            schema=DocumentSchema,
+            autocommit_duration_ms=config.INPUT_AUTOCOMMIT_MS,
+        )
+        ticket_sources.append(documents.without(pw.this.source))
+
+    tickets_raw = pw.Table.concat_reindex(*ticket_sources)
+
+    # One row per chunk of each ticket (see chunk_body)
+    ticket_chunks = tickets_raw.select(
+        pw.this.ticket_id,
+        pw.this.timestamp,
+        pw.this.customer_id,
+        pw.this.subject,
+        chunk=chunk_body(pw.this.body),
+    ).flatten(pw.this.chunk).select(
+        pw.this.ticket_id,
+        pw.this.timestamp,
+        pw.this.customer_id,
+        pw.this.subject,
+        body=pw.this.chunk[1],
+        chunk_no=pw.this.chunk[0],
+    )
+
+    # Use with_columns to apply the row-based UDF; chunks of all tickets share the micro-batches
+    enriched_tickets = ticket_chunks.with_columns(
+        # Pass the relevant columns for the current row (pw.this) to the UDF
+        embedding=compute_embedding_for_row(pw.this.subject, pw.this.body)
+    )
+
+    # --- Explicitly select ONLY the columns needed for the output ---
+    output_table = enriched_tickets.select(
+        pw.this.ticket_id,
+        pw.this.timestamp,
+        pw.this.customer_id,
+        pw.this.subject,
+        pw.this.body,
+        pw.this.chunk_no,
+        pw.this.embedding,
+    )
+    # -------------------------------------------------------------------
+
+    print(f"Configuring index writer to: {OUTPUT_DIR}")
+
+    # The writer owns the metadata CSV, the float32 vector file and its sidecar, so it
+    # can apply retractions and compact all three together
+    index_writer = EmbeddingStoreWriter(dim=embedding_model.get_sentence_embedding_dimension(), resume=resume_output)
+    pw.io.subscribe(
+        output_table,
+        on_change=index_writer.on_change,
+        on_end=index_writer.on_end,
+        on_time_end=index_writer.on_time_end,
+    )
+
+    print("Starting Pathway pipeline processing loop...")
+    pw.run(persistence_config=persistence_config)
+    print("Pathway pipeline finished.")
+    for line in ingest_metrics.summary():
+        print(f"Ingested {line}")
+    if embedding_cache is not None:
+        print(f"Embedding cache: {embedding_cache.hits} hits, {embedding_cache.misses} misses "
+              f"({embedding_cache.hit_rate:.1%} hit rate), {embedding_cache.evictions} evicted")
+
+
+if __name__ == "__main__":
+    run_pathway_pipeline()
 
 '''
 sudo docker build -t realtime-rag-assistant .
@@ -1,171 +1,759 @@
-import os
-import pandas as pd
-import numpy as np
-from sentence_transformers import SentenceTransformer
-from typing import List
-import logging
-from openai import OpenAI # <-- MODIFIED IMPORT
-
-from src.config import OPENAI_API_KEY
-
-logger = logging.getLogger(__name__)
-
-# ---------------------------
-# Config
-# ---------------------------
-INDEXED_CSV_PATH = "/app/data/output/indexed_data.csv"
-EMBEDDING_MODEL_NAME = os.environ.get("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
-TOP_K = 5  # Number of sources to retrieve
-OPENAI_MODEL = "gpt-3.5-turbo"
-
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY is not set in environment variables.")
-
-# <-- INITIALIZE THE NEW OPENAI CLIENT -->
-client = OpenAI(api_key=OPENAI_API_KEY)
-# ----------------------------------------
-
-
-# ---------------------------
-# Helper classes
-# ---------------------------
-class SourceNode:
-    """Represents a source document returned by the RAG engine."""
-    def __init__(self, node_id, text=None, metadata=None, score=None):
-        self.node_id = node_id
-        self.text = text
-        self.metadata = metadata or {}
-        self.score = score or 1.0
-
-    def get_content(self, metadata_mode="all"):
-        return self.text
-
-
-class ChatEngine:
-    """Enterprise-ready RAG engine with GPT-3.5 integration."""
-    def __init__(self):
-        self.index_df = pd.DataFrame()
-        self.embeddings = None
-        self.model = SentenceTransformer(EMBEDDING_MODEL_NAME)
-        self.load_index()
-
-    def load_index(self):
-        """Load indexed CSV and embeddings."""
-        if os.path.exists(INDEXED_CSV_PATH):
-            try:
-                self.index_df = pd.read_csv(INDEXED_CSV_PATH)
-                if "embedding_str" in self.index_df.columns:
-                    self.embeddings = np.array(self.index_df["embedding_str"].apply(eval).tolist())
-                    logger.info(f"Loaded {len(self.index_df)} rows with embeddings")
-                else:
-                    logger.warning("CSV missing 'embedding_str' column")
-                    self.embeddings = None
-            except Exception as e:
-                logger.error(f"Failed to load indexed CSV: {e}")
-                self.index_df = pd.DataFrame()
-                self.embeddings = None
-        else:
-            logger.warning("Indexed CSV not found, starting with empty index")
-            self.index_df = pd.DataFrame()
-            self.embeddings = None
-
-    def reload_index(self):
-        """Reload the CSV index."""
-        logger.info("Reloading RAG index...")
-        self.load_index()
-        logger.info("RAG index reloaded successfully")
-
-    # ---------------------------
-    # Retrieval
-    # ---------------------------
-    def retrieve_sources(self, query: str, top_k=TOP_K) -> List[SourceNode]:
-        """Return top-k relevant tickets for a query."""
-        if self.index_df.empty or self.embeddings is None:
-            return []
-
-        query_emb = self.model.encode([query])[0]
-        emb_norm = self.embeddings / np.linalg.norm(self.embeddings, axis=1, keepdims=True)
-        query_norm = query_emb / np.linalg.norm(query_emb)
-        scores = np.dot(emb_norm, query_norm)
-
-        top_indices = scores.argsort()[::-1][:top_k]
-        sources = []
-        for idx in top_indices:
-            row = self.index_df.iloc[idx]
-            sources.append(SourceNode(
-                node_id=row.get("ticket_id", "unknown"),
-                text=row.get("body", ""),
-                metadata=row.to_dict(),
-                score=float(scores[idx])
-            ))
-        return sources
-
-    # ---------------------------
-    # GPT-3.5 integration
-    # ---------------------------
-    def generate_answer(self, query: str, sources: List[SourceNode]) -> str:
-        """Use OpenAI GPT to generate answer using retrieved sources."""
-        if not sources:
-            return f"No relevant tickets found for query: '{query}'"
-
-        context = ""
-        for i, s in enumerate(sources, 1):
-            context += f"Source {i} (Ticket ID: {s.node_id}): {s.text}\n"
-
-        prompt = f"""
-You are an enterprise support assistant. Use the following ticket sources to answer the user query.
-Provide a clear, concise answer and cite relevant sources by Ticket ID.
-
-User Query: {query}
-
-Sources:
-{context}
-
-Answer:
-"""
-        # <-- ENTIRE API CALL SECTION IS MODIFIED -->
-        try:
-            response = client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": "You are a helpful enterprise support assistant."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.2,
-                max_tokens=500
-            )
-            answer_text = response.choices[0].message.content.strip()
-            return answer_text
-        except Exception as e:
-            logger.error(f"OpenAI API error: {e}", exc_info=True)
-            return f"Error generating answer: {e}"
-        # ---------------------------------------------
-
-    # ---------------------------
-    # Chat interfaces
-    # ---------------------------
-    def chat(self, query: str):
-        """Synchronous chat (Streamlit)."""
-        sources = self.retrieve_sources(query)
-        answer_text = self.generate_answer(query, sources)
-        return type("Response", (), {"response": answer_text, "source_nodes": sources})()
-
-    async def achat(self, query: str):
-        """Async chat (FastAPI)."""
-        return self.chat(query)
-
-
-# ---------------------------
-# Global singleton
-# ---------------------------
-_chat_engine_instance = None
-
-def get_chat_engine():
-    global _chat_engine_instance
-    if _chat_engine_instance is None:
-        _chat_engine_instance = ChatEngine()
-    return _chat_engine_instance
-
-def reload_index():
-    engine = get_chat_engine()
-    engine.reload_index()
+import os
+import re
+import time
+import asyncio
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from sentence_transformers import SentenceTransformer
+from typing import AsyncIterator, Iterator, List, Optional
+import logging
+from openai import AsyncOpenAI, OpenAI # <-- MODIFIED IMPORT
+
+from src.config import OPENAI_API_KEY
+from src.answer_cache import AnswerCache
+from src.ann import ANN_BACKENDS, load_vector_index, save_vector_index
+from src.embedding_store import INDEX_MANIFEST_PATH, OUTPUT_DIR
+from src.index_tail import IndexTail
+from src.index_watcher import ManifestWatcher
+from src.lexical_index import LexicalIndex
+from src.metadata_index import MetadataIndex
+from src.micro_batcher import MicroBatcher
+from src.quantization import QUANTIZED_STORAGES, quantized_top_k
+from src.record_store import RecordStore
+from src.shared_index import SharedIndexReader
+from src.sharded_search import ShardedSearcher
+from src.retrieval import (blocked_top_k, blocked_top_k_many, gathered_top_k, l2_normalize,
+                           reciprocal_rank_fusion)
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Config
+# ---------------------------
+EMBEDDING_MODEL_NAME = os.environ.get("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+TOP_K = 5  # Number of sources to retrieve
+# The index is refreshed whenever the pipeline publishes a new manifest, and at least this often; 0 disables both
+INDEX_REFRESH_SECONDS = float(os.environ.get("INDEX_REFRESH_SECONDS", "5"))
+# "snapshot" maps the snapshots the pipeline publishes (shared by all local processes),
+# "tail" parses the output CSVs into this process
+INDEX_READER = os.environ.get("INDEX_READER", "snapshot")
+ANN_BACKEND = os.environ.get("ANN_BACKEND", "exact")  # "exact", "hnsw" or "ivf"
+ANN_MIN_ROWS = int(os.environ.get("ANN_MIN_ROWS", "50000"))  # smaller corpora always use the exact scan
+ANN_SAVE_SECONDS = float(os.environ.get("ANN_SAVE_SECONDS", "300"))
+# "float32" scans the stored vectors; "float16"/"int8" scan a compact in-memory copy
+# and re-score the best candidates against the float32 rows
+EMBEDDING_STORAGE = os.environ.get("EMBEDDING_STORAGE", "float32")
+RETRIEVAL_SHARDS = int(os.environ.get("RETRIEVAL_SHARDS", "0"))  # worker processes for the exact float32 scan, 0 scans in-process
+SHARD_MIN_ROWS = int(os.environ.get("SHARD_MIN_ROWS", "200000"))  # below this the in-process scan beats the IPC round trip
+RETRIEVAL_MODE = os.environ.get("RETRIEVAL_MODE", "hybrid")  # "hybrid" (BM25 + vectors) or "vector"
+HYBRID_CANDIDATES = 4  # each ranking contributes top_k * this candidates to the fusion
+# Long tickets are indexed as several chunks; searches rank top_k * this chunk rows and keep
+# the best chunk of each ticket, so a ticket matching in many chunks does not crowd out others
+CHUNK_CANDIDATES = int(os.environ.get("CHUNK_CANDIDATES", "3"))
+RRF_K = 60
+TICKET_ID_TOKEN_RE = re.compile(r"[A-Za-z0-9]+(?:[-_][A-Za-z0-9]+)+|[A-Za-z]+[0-9]+")
+OPENAI_MODEL = "gpt-3.5-turbo"
+PROMPT_VERSION = f"{OPENAI_MODEL}/1"  # bump when build_messages changes, so cached answers are not reused
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", "4096"))  # query embeddings kept, 0 disables
+QUERY_BATCH_SIZE = int(os.environ.get("QUERY_BATCH_SIZE", "32"))  # max queries per encode() call
+QUERY_BATCH_MAX_WAIT_MS = float(os.environ.get("QUERY_BATCH_MAX_WAIT_MS", "2"))
+# Cost of scoring one gathered candidate row relative to one row of the sequential scan
+# (measured ~2x for small candidate sets, ~5x for large ones on in-memory float32 rows)
+PREFILTER_ROW_COST = float(os.environ.get("PREFILTER_ROW_COST", "4"))
+BATCH_LLM_CONCURRENCY = int(os.environ.get("BATCH_LLM_CONCURRENCY", "8"))  # OpenAI calls in flight per batch
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", "1024"))  # 0 disables the answer cache
+ANSWER_CACHE_TTL_SECONDS = float(os.environ.get("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.95"))  # min cosine to a cached query
+# Threads running encode + scoring for async callers; bounds CPU work the event loop can queue up
+RETRIEVAL_WORKERS = int(os.environ.get("RETRIEVAL_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+if not OPENAI_API_KEY:
+    raise ValueError("OPENAI_API_KEY is not set in environment variables.")
+
+# <-- INITIALIZE THE NEW OPENAI CLIENT -->
+client = OpenAI(api_key=OPENAI_API_KEY)
+async_client = AsyncOpenAI(api_key=OPENAI_API_KEY)  # used by achat, never blocks the event loop
+# ----------------------------------------
+
+
+# ---------------------------
+# Helper classes
+# ---------------------------
+class SourceNode:
+    """Represents a source document returned by the RAG engine.
+
+    Hits from the index carry their record store and row; `metadata` is only
+    materialized as a dict when something reads it. `score` is the cosine
+    similarity of the matched chunk; in hybrid retrieval the results are
+    ordered by `rank_score`, the reciprocal-rank fusion score, instead.
+    """
+    __slots__ = ("node_id", "text", "score", "rank_score", "_metadata", "_store", "_row")
+
+    def __init__(self, node_id, text=None, metadata=None, score=None, store=None, row=None, rank_score=None):
+        self.node_id = node_id
+        self.text = text
+        self._metadata = metadata
+        self.score = score or 1.0
+        self.rank_score = rank_score
+        self._store = store
+        self._row = row
+
+    @property
+    def metadata(self) -> dict:
+        if self._metadata is None:
+            self._metadata = self._store.record(self._row) if self._store is not None else {}
+        return self._metadata
+
+    def field(self, name: str, default=None):
+        """One metadata field, read from the record store without building the dict."""
+        if self._metadata is None and self._store is not None:
+            return self._store.get(self._row, name, default)
+        return self.metadata.get(name, default)
+
+    def get_content(self, metadata_mode="all"):
+        return self.text
+
+
+class ChatResponse:
+    """Answer text and the sources it was generated from."""
+    __slots__ = ("response", "source_nodes")
+
+    def __init__(self, response, source_nodes: List[SourceNode]):
+        self.response = response
+        self.source_nodes = source_nodes
+
+
+class IndexSnapshot:
+    """Everything a query reads from the index, as of one refresh. Never modified once published.
+
+    The engine builds the next snapshot off to the side and publishes it by
+    replacing a single reference, so a query that took a snapshot sees a
+    matrix, liveness mask and metadata that belong together, however many
+    refreshes or reloads happen meanwhile. The column and search structures
+    are append-only and shared with the following snapshots of the same build;
+    a snapshot only ever reads their first `rows` rows.
+    """
+    __slots__ = ("index_version", "rows", "records", "metadata", "lexical", "embeddings", "alive",
+                 "ann", "quantized", "live", "live_count")
+
+    def __init__(self, index_version=0, records=None, metadata=None, lexical=None, embeddings=None,
+                 alive=None, ann=None, quantized=None, live=None):
+        self.index_version = index_version  # bumped whenever the index is built from scratch
+        self.records = records if records is not None else RecordStore()  # ticket fields, one entry per row
+        self.metadata = metadata if metadata is not None else MetadataIndex()  # filterable columns of the rows
+        self.lexical = lexical if lexical is not None else LexicalIndex()  # BM25 over subject and body
+        self.embeddings = embeddings
+        self.rows = 0 if embeddings is None else len(embeddings)
+        self.alive = alive  # False for rows retracted or superseded by a newer version
+        self.ann = ann  # optional approximate index, shared and grown in place; searches stay below `rows`
+        self.quantized = quantized  # optional float16/int8 copy of the embeddings for the exact scan
+        self.live = live if live is not None else {}  # ticket_id -> live row of its first chunk
+        self.live_count = len(self.live)
+
+
+class ChatEngine:
+    """Enterprise-ready RAG engine with GPT-3.5 integration."""
+    def __init__(self):
+        self.snapshot = IndexSnapshot()  # what queries read; replaced as a whole on every refresh
+        self.sharded = ShardedSearcher(RETRIEVAL_SHARDS) if RETRIEVAL_SHARDS > 0 else None
+        self.model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+        if INDEX_READER not in ("snapshot", "tail"):
+            raise ValueError(f"Unknown INDEX_READER '{INDEX_READER}', expected snapshot or tail")
+        self._tail = None  # reader of the pipeline output feeding the build
+        self._build = None  # next snapshot's structures, only touched by the refreshing thread
+        self._index_lock = threading.Lock()
+        self._ann_saved_at = 0.0
+        self._watcher = None  # refreshes the index when the pipeline publishes a snapshot
+        self._retrieval_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+        self._query_cache = OrderedDict()  # query text -> unit embedding, least recently used first
+        self._query_cache_lock = threading.Lock()
+        # Concurrent queries (UI, API workers) share encode() calls
+        self._query_batcher = MicroBatcher(self._encode_queries, max_batch_size=QUERY_BATCH_SIZE,
+                                           max_wait=QUERY_BATCH_MAX_WAIT_MS / 1000, name="query-encoder")
+        self.answer_cache = None
+        if ANSWER_CACHE_SIZE > 0:
+            self.answer_cache = AnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_THRESHOLD)
+        if ANN_BACKEND != "exact" and ANN_BACKEND not in ANN_BACKENDS:
+            raise ValueError(f"Unknown ANN_BACKEND '{ANN_BACKEND}', expected exact, {', '.join(ANN_BACKENDS)}")
+        if EMBEDDING_STORAGE != "float32" and EMBEDDING_STORAGE not in QUANTIZED_STORAGES:
+            raise ValueError(f"Unknown EMBEDDING_STORAGE '{EMBEDDING_STORAGE}', "
+                             f"expected float32, {', '.join(QUANTIZED_STORAGES)}")
+        if self.sharded is not None and EMBEDDING_STORAGE != "float32":
+            logger.warning(f"RETRIEVAL_SHARDS is ignored with EMBEDDING_STORAGE={EMBEDDING_STORAGE}: "
+                           f"the quantized copy lives in this process")
+        self.load_index()
+        if INDEX_REFRESH_SECONDS > 0:
+            self.start_auto_refresh(INDEX_REFRESH_SECONDS)
+
+    @property
+    def index_version(self) -> int:
+        return self.snapshot.index_version
+
+    def load_index(self):
+        """Build the whole index from scratch; queries keep using the current snapshot meanwhile."""
+        with self._index_lock:
+            self._reset_locked()
+            self._refresh_locked()
+        if not self.snapshot.rows:
+            logger.warning("Index is empty or not written yet, starting with empty index")
+
+    def refresh_index(self) -> int:
+        """Append rows written by the pipeline since the last call. Returns the number of new rows."""
+        with self._index_lock:
+            if self._tail.needs_reset():
+                logger.info("Pipeline output was rewritten, loading index from scratch")
+                self._reset_locked()
+            return self._refresh_locked()
+
+    def _reset_locked(self):
+        """Start a new build from an empty index. Nothing is published until the next refresh."""
+        self._tail = SharedIndexReader() if INDEX_READER == "snapshot" else IndexTail()
+        self._build = IndexSnapshot(self.snapshot.index_version + 1)
+
+    def _refresh_locked(self) -> int:
+        try:
+            new_records = self._tail.poll()
+        except Exception as e:
+            logger.error(f"Failed to read index updates: {e}")
+            return 0
+        # The build holds the append-only structures; rows are appended to them
+        # first and only become visible through the snapshot published below
+        build = self._build
+        if new_records:
+            if INDEX_READER == "snapshot":
+                build.records = self._tail.records  # mapped, shared with the other processes
+            else:
+                build.records.extend(new_records)
+            build.metadata.extend(new_records)
+            if RETRIEVAL_MODE == "hybrid":
+                build.lexical.extend(new_records)
+            build.embeddings = self._tail.vectors()
+            if EMBEDDING_STORAGE != "float32":
+                if build.quantized is None:
+                    build.quantized = QUANTIZED_STORAGES[EMBEDDING_STORAGE](build.embeddings.shape[1])
+                build.quantized = build.quantized.updated(build.embeddings)
+            if ANN_BACKEND != "exact":
+                self._update_ann(build)
+        # Retractions can arrive without new rows, so a snapshot is published every time
+        snapshot = IndexSnapshot(build.index_version, build.records, build.metadata, build.lexical,
+                                 build.embeddings, self._tail.alive(), build.ann, build.quantized, self._tail.live)
+        previous, self.snapshot = self.snapshot, snapshot
+        if new_records:
+            logger.info(f"Appended {len(new_records)} rows, index now has {snapshot.live_count} live tickets")
+        if snapshot.index_version != previous.index_version and self.answer_cache is not None:
+            self.answer_cache.evict_index_versions(snapshot.index_version)
+        return len(new_records)
+
+    def _update_ann(self, build: IndexSnapshot):
+        """Insert the new rows into the ANN index of the build, loading or creating it first if needed."""
+        manifest, embeddings = self._tail.manifest, build.embeddings
+        try:
+            if build.ann is None:
+                ann = load_vector_index(ANN_BACKEND, manifest, OUTPUT_DIR)
+                # A copy saved by another process may already be ahead of what we can see
+                if ann is None or ann.rows > len(embeddings):
+                    ann = ANN_BACKENDS[ANN_BACKEND](manifest["dim"])
+                else:
+                    self._ann_saved_at = time.time()
+                logger.info(f"Using {ANN_BACKEND} index, {ann.rows} rows loaded from disk")
+            else:
+                ann = build.ann
+            ann.add(embeddings, ann.rows)
+            build.ann = ann
+        except Exception as e:
+            logger.error(f"Failed to update {ANN_BACKEND} index, falling back to exact search: {e}", exc_info=True)
+            build.ann = None
+            return
+        if time.time() - self._ann_saved_at > ANN_SAVE_SECONDS:
+            # The in-memory index is fine either way; a failed save is retried after the next interval
+            self._ann_saved_at = time.time()
+            try:
+                save_vector_index(ann, manifest, OUTPUT_DIR)
+            except Exception as e:
+                logger.warning(f"Failed to save {ANN_BACKEND} index: {e}")
+
+    def reload_index(self):
+        """Pick up new rows from the pipeline output."""
+        logger.info("Reloading RAG index...")
+        self.refresh_index()
+        logger.info("RAG index reloaded successfully")
+
+    def start_auto_refresh(self, interval: float):
+        """Refresh as soon as the pipeline publishes a new snapshot, and at least every `interval` seconds."""
+        self._watcher = ManifestWatcher(INDEX_MANIFEST_PATH, self.refresh_index, max_interval=interval)
+        self._watcher.start()
+
+    # ---------------------------
+    # Retrieval
+    # ---------------------------
+    def _encode_queries(self, queries: List[str]) -> List[np.ndarray]:
+        vectors = self.model.encode(queries, batch_size=len(queries), show_progress_bar=False)
+        return list(l2_normalize(np.asarray(vectors, dtype=np.float32)))
+
+    def _cached_query(self, query: str) -> Optional[np.ndarray]:
+        with self._query_cache_lock:
+            query_emb = self._query_cache.get(query)
+            if query_emb is not None:
+                self._query_cache.move_to_end(query)
+            return query_emb
+
+    def _cache_query(self, query: str, query_emb: np.ndarray):
+        if QUERY_CACHE_SIZE <= 0:
+            return
+        query_emb.setflags(write=False)  # shared between callers
+        with self._query_cache_lock:
+            self._query_cache[query] = query_emb
+            self._query_cache.move_to_end(query)
+            while len(self._query_cache) > QUERY_CACHE_SIZE:
+                self._query_cache.popitem(last=False)
+
+    def encode_query(self, query: str) -> np.ndarray:
+        """Unit-length float32 embedding of a query, from the LRU or the batched encoder."""
+        query_emb = self._cached_query(query)
+        if query_emb is None:
+            query_emb = self._query_batcher(query)
+            self._cache_query(query, query_emb)
+        return query_emb
+
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Embeddings of many queries, encoding all LRU misses in a single forward pass."""
+        query_embs = [self._cached_query(q) for q in queries]
+        missing = list(dict.fromkeys(q for q, e in zip(queries, query_embs) if e is None))
+        if missing:
+            encoded = dict(zip(missing, self._encode_queries(missing)))
+            for query, query_emb in encoded.items():
+                self._cache_query(query, query_emb)
+            query_embs = [encoded[q] if e is None else e for q, e in zip(queries, query_embs)]
+        if not query_embs:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        return np.stack(query_embs)
+
+    def _source_nodes(self, records: RecordStore, top_indices, top_scores, rank_scores=None) -> List[SourceNode]:
+        rank_scores = rank_scores.tolist() if rank_scores is not None else [None] * len(top_indices)
+        return [
+            SourceNode(
+                node_id=records.get(row, "ticket_id", "unknown"),
+                text=records.get(row, "body", ""),
+                score=score,
+                store=records,
+                row=row,
+                rank_score=rank_score
+            )
+            for row, score, rank_score in zip(top_indices.tolist(), top_scores.tolist(), rank_scores)
+        ]
+
+    def retrieve_sources(self, query: str, top_k=TOP_K, exact=False, query_emb=None,
+                         customer_id=None, since=None, until=None, min_score=None) -> List[SourceNode]:
+        """Return top-k relevant tickets for a query.
+
+        Rows are chunks of tickets; each ticket is scored by its best chunk,
+        whose text becomes the source text.
+        Uses the ANN index once the corpus reaches ANN_MIN_ROWS, unless `exact`
+        is set (e.g. to measure ANN recall against the brute-force result).
+        Pass `query_emb` (from encode_query) to skip encoding the query again.
+        Results can be restricted to one customer_id, a timestamp range
+        (`since`/`until` in epoch seconds, inclusive) and a minimum score.
+        """
+        # One reference for the whole query: a concurrent refresh publishes a new snapshot instead
+        snapshot = self.snapshot
+        records, metadata, embeddings, ann = snapshot.records, snapshot.metadata, snapshot.embeddings, snapshot.ann
+        if not snapshot.rows:
+            return []
+
+        rows = snapshot.rows
+        mask = snapshot.alive[:rows]
+        filters = dict(customer_id=customer_id, since=since, until=until)
+        # Queries naming tickets by id are answered from the ticket_id map, without encoding or scanning
+        id_rows = self._ticket_id_rows(snapshot, query, mask, filters)
+        if len(id_rows):
+            return self._source_nodes(records, id_rows[:top_k], np.ones(min(len(id_rows), top_k), np.float32))
+
+        if query_emb is None:
+            query_emb = self.encode_query(query)
+        use_ann = ann is not None and not exact and snapshot.live_count >= ANN_MIN_ROWS
+        plan = self._search_plan(metadata, rows, use_ann, **filters)
+        if plan == "prefilter":
+            candidates = metadata.candidates(rows, **filters)
+            candidates = candidates[mask[candidates]]
+            search = lambda k: gathered_top_k(embeddings, candidates, query_emb, k)
+        else:
+            row_filter = metadata.mask(rows, **filters)
+            if row_filter is not None:
+                mask = mask & row_filter
+            search = lambda k: self._vector_search(snapshot, query_emb, k, mask, plan == "ann")
+        top_indices, top_scores, rank_scores = self._rank_tickets(snapshot, query, query_emb, top_k, search,
+                                                                  snapshot.alive[:rows], filters)
+        if min_score is not None:
+            keep = top_scores >= min_score
+            top_indices, top_scores = top_indices[keep], top_scores[keep]
+            rank_scores = rank_scores[keep] if rank_scores is not None else None
+        return self._source_nodes(records, top_indices, top_scores, rank_scores)
+
+    def retrieve_sources_batch(self, queries: List[str], top_k=TOP_K, exact=False):
+        """retrieve_sources for many queries: one encode pass and one matrix-matrix product per block.
+
+        Returns (query embeddings, list of sources per query).
+        """
+        snapshot = self.snapshot
+        embeddings, ann, quantized = snapshot.embeddings, snapshot.ann, snapshot.quantized
+        query_embs = self.encode_queries(queries)
+        if not snapshot.rows:
+            return query_embs, [[] for _ in queries]
+        alive = snapshot.alive[:snapshot.rows]
+        use_ann = ann is not None and not exact and snapshot.live_count >= ANN_MIN_ROWS
+        k = self._candidate_depth(top_k * CHUNK_CANDIDATES)
+        if use_ann:
+            hits = [ann.search(embeddings, q, k, mask=alive) for q in query_embs]
+        elif quantized is not None:
+            hits = [quantized_top_k(quantized, embeddings, q, k, mask=alive) for q in query_embs]
+        elif self._use_shards(embeddings):
+            hits = self.sharded.search_many(embeddings, query_embs, k, mask=alive)
+        else:
+            hits = blocked_top_k_many(embeddings, query_embs, k, mask=alive)
+        all_sources = []
+        for query, query_emb, first_hits in zip(queries, query_embs, hits):
+            id_rows = self._ticket_id_rows(snapshot, query, alive, {})
+            rank_scores = None
+            if len(id_rows):
+                top_indices, top_scores = id_rows[:top_k], np.ones(min(len(id_rows), top_k), np.float32)
+            else:
+                # Only queries whose first candidates were too few tickets search again, one by one
+                search = lambda k, q=query_emb: self._vector_search(snapshot, q, k, alive, use_ann)
+                top_indices, top_scores, rank_scores = self._rank_tickets(snapshot, query, query_emb, top_k, search,
+                                                                          alive, {}, first_hits)
+            all_sources.append(self._source_nodes(snapshot.records, top_indices, top_scores, rank_scores))
+        return query_embs, all_sources
+
+    def _vector_search(self, snapshot: IndexSnapshot, query_emb: np.ndarray, k: int, mask: np.ndarray,
+                       use_ann: bool):
+        """Top-k chunk rows by cosine score: ANN, quantized, sharded or blocked exact scan."""
+        embeddings = snapshot.embeddings
+        if use_ann:
+            return snapshot.ann.search(embeddings, query_emb, k, mask=mask)
+        if snapshot.quantized is not None:
+            return quantized_top_k(snapshot.quantized, embeddings, query_emb, k, mask=mask)
+        if self._use_shards(embeddings):
+            return self.sharded.search(embeddings, query_emb, k, mask=mask)
+        # The store holds unit-length float32 rows; the scan is blocked so scratch memory stays bounded
+        return blocked_top_k(embeddings, query_emb, k, mask=mask)
+
+    @staticmethod
+    def _candidate_depth(chunk_k: int) -> int:
+        """Vector candidates fetched for `chunk_k` ranked chunks (more in hybrid mode, for the fusion)."""
+        return chunk_k * HYBRID_CANDIDATES if RETRIEVAL_MODE == "hybrid" else chunk_k
+
+    def _rank_tickets(self, snapshot: IndexSnapshot, query: str, query_emb: np.ndarray, top_k: int, search,
+                      alive: np.ndarray, filters: dict, first_hits=None):
+        """Rank chunks and keep each ticket's best one, until top_k tickets are found or no candidates are left.
+
+        `search(k)` returns the top-k (rows, scores) of the vector search. The
+        chunk depth starts at top_k * CHUNK_CANDIDATES and doubles while long
+        tickets fill it with their chunks. `first_hits` are the search results
+        at the starting depth, if the caller already has them.
+        """
+        hybrid = RETRIEVAL_MODE == "hybrid"
+        chunk_k = top_k * CHUNK_CANDIDATES
+        while True:
+            k = self._candidate_depth(chunk_k)
+            top_indices, top_scores = first_hits if first_hits is not None else search(k)
+            first_hits = None
+            exhausted = len(top_indices) < k
+            rank_scores = None
+            if hybrid:
+                top_indices, top_scores, rank_scores = self._fuse_lexical(snapshot, query, query_emb, top_indices,
+                                                                          chunk_k, alive, filters)
+                exhausted = exhausted and len(top_indices) < chunk_k
+            top_indices, top_scores, rank_scores = self._best_chunk_per_ticket(snapshot.records, top_indices,
+                                                                               top_scores, top_k, rank_scores)
+            if len(top_indices) >= top_k or exhausted:
+                return top_indices, top_scores, rank_scores
+            chunk_k *= 2
+
+    @staticmethod
+    def _best_chunk_per_ticket(records: RecordStore, rows: np.ndarray, scores: np.ndarray, top_k: int,
+                               rank_scores: Optional[np.ndarray] = None):
+        """Aggregate ranked chunk rows to their tickets: the first (best) chunk of each ticket, top_k tickets.
+
+        Returns (rows, scores, rank_scores) of the kept chunks; rank_scores stays None if not given.
+        """
+        seen, keep = set(), []
+        for i, row in enumerate(rows.tolist()):
+            ticket_id = records.get(row, "ticket_id")
+            if ticket_id not in seen:
+                seen.add(ticket_id)
+                keep.append(i)
+                if len(keep) == top_k:
+                    break
+        keep = np.array(keep, dtype=np.int64)
+        return rows[keep], scores[keep], rank_scores[keep] if rank_scores is not None else None
+
+    @staticmethod
+    def _ticket_id_rows(snapshot: IndexSnapshot, query: str, mask: np.ndarray, filters: dict) -> np.ndarray:
+        """Live first-chunk rows of the tickets whose ids appear verbatim in the query."""
+        live = snapshot.live
+        found = []
+        for token in TICKET_ID_TOKEN_RE.findall(query):
+            row = live.get(token, live.get(token.upper()))
+            if row is not None and row < snapshot.rows and mask[row] and row not in found:
+                found.append(row)
+        found = np.array(found, dtype=np.int64)
+        if len(found) and any(v is not None for v in filters.values()):
+            found = found[snapshot.metadata.matches(found, **filters)]
+        return found
+
+    @staticmethod
+    def _fuse_lexical(snapshot: IndexSnapshot, query: str, query_emb: np.ndarray, vector_rows: np.ndarray,
+                      top_k: int, alive: np.ndarray, filters: dict):
+        """Reciprocal-rank fusion of the vector ranking with the BM25 ranking.
+
+        Returns the fused top-k rows, their cosine scores and their fused scores.
+        The rows are in fused order; min_score still applies to the cosine score,
+        so thresholds mean the same thing in both modes.
+        """
+        lexical_rows, _ = snapshot.lexical.search(query, len(vector_rows) or top_k, snapshot.rows, mask=alive)
+        if len(lexical_rows) and any(v is not None for v in filters.values()):
+            lexical_rows = lexical_rows[snapshot.metadata.matches(lexical_rows, **filters)]
+        fused, fused_scores = reciprocal_rank_fusion([vector_rows, lexical_rows], top_k, RRF_K)
+        return fused, np.asarray(snapshot.embeddings[fused]) @ l2_normalize(query_emb), fused_scores
+
+    def _use_shards(self, embeddings: np.ndarray) -> bool:
+        """Whether the exact scan goes to the shard workers (they map the store file themselves)."""
+        return (self.sharded is not None and isinstance(embeddings, np.memmap)
+                and len(embeddings) >= SHARD_MIN_ROWS)
+
+    @staticmethod
+    def _search_plan(metadata: MetadataIndex, rows: int, use_ann: bool, **filters) -> str:
+        """Choose "prefilter", "ann" or "scan" for a search with optional metadata filters.
+
+        Pre-filtering lists the matching rows from the metadata indexes and scores
+        only those, each PREFILTER_ROW_COST times dearer than a row of the
+        sequential scan. Otherwise the filters are post-applied as a mask to the
+        ANN search or the full scan. ANN has to widen its search by about
+        1 / selectivity to find enough matching rows, so it is only used for
+        broad filters.
+        """
+        if all(v is None for v in filters.values()):
+            return "ann" if use_ann else "scan"
+        matching = metadata.estimate(**filters)
+        if use_ann and matching >= 0.5 * rows:
+            return "ann"
+        return "prefilter" if matching * PREFILTER_ROW_COST < rows else "scan"
+
+    async def aretrieve_sources(self, query: str, top_k=TOP_K, query_emb=None, **filters) -> List[SourceNode]:
+        """retrieve_sources on the bounded retrieval pool, off the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._retrieval_executor,
+            functools.partial(self.retrieve_sources, query, top_k, query_emb=query_emb, **filters))
+
+    async def aencode_query(self, query: str) -> np.ndarray:
+        """encode_query without blocking the event loop; the encode runs on the batcher thread."""
+        query_emb = self._cached_query(query)
+        if query_emb is None:
+            query_emb = await self._query_batcher.acall(query)
+            self._cache_query(query, query_emb)
+        return query_emb
+
+    # ---------------------------
+    # Answer cache
+    # ---------------------------
+    def _answer_key(self, sources: List[SourceNode]) -> tuple:
+        # (ticket_id, time) names one version of a ticket; an edit gets a new time
+        versions = ((s.node_id, s.field("time")) for s in sources)
+        return AnswerCache.key(versions, PROMPT_VERSION, self.index_version)
+
+    def _lookup_answer(self, query: str, sources: List[SourceNode], query_emb=None):
+        """Return (cache key, query embedding, cached answer or None); key is None when caching is off."""
+        if self.answer_cache is None or not sources:
+            return None, query_emb, None
+        if query_emb is None:
+            query_emb = self.encode_query(query)
+        key = self._answer_key(sources)
+        return key, query_emb, self.answer_cache.get(key, query_emb)
+
+    async def _alookup_answer(self, query: str, sources: List[SourceNode], query_emb=None):
+        if self.answer_cache is not None and sources and query_emb is None:
+            query_emb = await self.aencode_query(query)
+        return self._lookup_answer(query, sources, query_emb)
+
+    def _store_answer(self, key, query_emb, answer: str):
+        if key is not None:
+            self.answer_cache.put(key, query_emb, answer)
+
+    # ---------------------------
+    # GPT-3.5 integration
+    # ---------------------------
+    def build_messages(self, query: str, sources: List[SourceNode]) -> List[dict]:
+        """Chat messages asking the model to answer `query` from `sources`."""
+        context = ""
+        for i, s in enumerate(sources, 1):
+            context += f"Source {i} (Ticket ID: {s.node_id}): {s.text}\n"
+
+        prompt = f"""
+You are an enterprise support assistant. Use the following ticket sources to answer the user query.
+Provide a clear, concise answer and cite relevant sources by Ticket ID.
+
+User Query: {query}
+
+Sources:
+{context}
+
+Answer:
+"""
+        return [
+            {"role": "system", "content": "You are a helpful enterprise support assistant."},
+            {"role": "user", "content": prompt}
+        ]
+
+    def generate_answer(self, query: str, sources: List[SourceNode], query_emb=None) -> str:
+        """Use OpenAI GPT to generate answer using retrieved sources."""
+        if not sources:
+            return f"No relevant tickets found for query: '{query}'"
+        key, query_emb, cached = self._lookup_answer(query, sources, query_emb)
+        if cached is not None:
+            return cached
+
+        # <-- ENTIRE API CALL SECTION IS MODIFIED -->
+        try:
+            response = client.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=self.build_messages(query, sources),
+                temperature=0.2,
+                max_tokens=500
+            )
+            answer_text = response.choices[0].message.content.strip()
+            self._store_answer(key, query_emb, answer_text)
+            return answer_text
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}", exc_info=True)
+            return f"Error generating answer: {e}"
+        # ---------------------------------------------
+
+    async def agenerate_answer(self, query: str, sources: List[SourceNode], query_emb=None) -> str:
+        """generate_answer with the async OpenAI client."""
+        if not sources:
+            return f"No relevant tickets found for query: '{query}'"
+        key, query_emb, cached = await self._alookup_answer(query, sources, query_emb)
+        if cached is not None:
+            return cached
+        try:
+            response = await async_client.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=self.build_messages(query, sources),
+                temperature=0.2,
+                max_tokens=500
+            )
+            answer_text = response.choices[0].message.content.strip()
+            self._store_answer(key, query_emb, answer_text)
+            return answer_text
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}", exc_info=True)
+            return f"Error generating answer: {e}"
+
+    def stream_answer(self, query: str, sources: List[SourceNode], query_emb=None) -> Iterator[str]:
+        """generate_answer, yielding the answer text piece by piece as the model produces it."""
+        if not sources:
+            yield f"No relevant tickets found for query: '{query}'"
+            return
+        key, query_emb, cached = self._lookup_answer(query, sources, query_emb)
+        if cached is not None:
+            yield cached
+            return
+        try:
+            stream = client.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=self.build_messages(query, sources),
+                temperature=0.2,
+                max_tokens=500,
+                stream=True
+            )
+            parts = []
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield parts[-1]
+            self._store_answer(key, query_emb, "".join(parts).strip())
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}", exc_info=True)
+            yield f"Error generating answer: {e}"
+
+    async def astream_answer(self, query: str, sources: List[SourceNode], query_emb=None) -> AsyncIterator[str]:
+        """stream_answer with the async OpenAI client."""
+        if not sources:
+            yield f"No relevant tickets found for query: '{query}'"
+            return
+        key, query_emb, cached = await self._alookup_answer(query, sources, query_emb)
+        if cached is not None:
+            yield cached
+            return
+        try:
+            stream = await async_client.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=self.build_messages(query, sources),
+                temperature=0.2,
+                max_tokens=500,
+                stream=True
+            )
+            parts = []
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield parts[-1]
+            self._store_answer(key, query_emb, "".join(parts).strip())
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}", exc_info=True)
+            yield f"Error generating answer: {e}"
+
+    # ---------------------------
+    # Chat interfaces
+    # ---------------------------
+    def chat(self, query: str):
+        """Synchronous chat (Streamlit)."""
+        query_emb = self.encode_query(query)
+        sources = self.retrieve_sources(query, query_emb=query_emb)
+        answer_text = self.generate_answer(query, sources, query_emb)
+        return ChatResponse(answer_text, sources)
+
+    async def achat(self, query: str):
+        """Async chat (FastAPI): retrieval runs in the retrieval pool, generation on AsyncOpenAI."""
+        query_emb = await self.aencode_query(query)
+        sources = await self.aretrieve_sources(query, query_emb=query_emb)
+        answer_text = await self.agenerate_answer(query, sources, query_emb)
+        return ChatResponse(answer_text, sources)
+
+    async def achat_batch(self, queries: List[str], top_k=TOP_K, retrieval_only=False):
+        """achat for many queries. Retrieval runs as one batch; generation with BATCH_LLM_CONCURRENCY
+        calls in flight. With `retrieval_only` the responses carry sources and no answer."""
+        loop = asyncio.get_running_loop()
+        query_embs, all_sources = await loop.run_in_executor(
+            self._retrieval_executor, self.retrieve_sources_batch, queries, top_k)
+        if retrieval_only:
+            answers = [None] * len(queries)
+        else:
+            semaphore = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+
+            async def answer(query, sources, query_emb):
+                async with semaphore:
+                    return await self.agenerate_answer(query, sources, query_emb)
+
+            answers = await asyncio.gather(*(answer(q, s, e) for q, s, e in zip(queries, all_sources, query_embs)))
+        return [ChatResponse(a, s) for a, s in zip(answers, all_sources)]
+
+
+# ---------------------------
+# Global singleton
+# ---------------------------
+_chat_engine_instance = None
+
+def get_chat_engine():
+    global _chat_engine_instance
+    if _chat_engine_instance is None:
+        _chat_engine_instance = ChatEngine()
+    return _chat_engine_instance
+
+def reload_index():
+    engine = get_chat_engine()
+    engine.reload_index()
@@ -0,0 +1,43 @@
+# python src/record_store.py
+
+from typing import List
+
+
+class RecordStore:
+    """Ticket metadata held column by column, one entry per embedding row.
+
+    One Python list per field instead of one dict per row: less memory per
+    ticket, and reading a field of a hit is a single list index. Columns are
+    added the first time a record carries a new field. Rows are only appended,
+    so readers can use any row below the length they observed.
+    """
+    def __init__(self, columns=()):
+        self._columns = {name: [] for name in columns}
+        self.rows = 0
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    def extend(self, records: List[dict]):
+        for record in records:
+            for name in record:
+                if name not in self._columns:
+                    self._columns[name] = [None] * self.rows
+            for name, values in self._columns.items():
+                values.append(record.get(name))
+            self.rows += 1
+
+    def get(self, row: int, name: str, default=None):
+        values = self._columns.get(name)
+        if values is None:
+            return default
+        value = values[row]
+        return default if value is None else value
+
+    def record(self, row: int) -> dict:
+        """All fields of one row as a new dict."""
+        return {name: values[row] for name, values in list(self._columns.items())}
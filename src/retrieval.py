@@ -0,0 +1,137 @@
+# python src/retrieval.py
+
+import os
+import heapq
+from typing import Optional
+
+import numpy as np
+
+# Rows scored per block by blocked_top_k; bounds the per-query scratch memory
+BLOCK_ROWS = int(os.environ.get("RETRIEVAL_BLOCK_ROWS", "65536"))
+
+
+def l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    """Return `vectors` as float32 scaled to unit L2 norm along the last axis. Zero rows stay zero."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, np.finfo(np.float32).tiny)
+
+
+def cosine_scores(normalized_matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Cosine similarity of every row with `query`. The matrix must already be L2-normalized."""
+    return normalized_matrix @ l2_normalize(query)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the `k` highest scores, best first. O(N + k log k) instead of a full sort."""
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        candidates = np.argpartition(scores, n - k)[n - k:]
+    else:
+        candidates = np.arange(n)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def blocked_top_k(normalized_matrix: np.ndarray, query: np.ndarray, k: int,
+                  mask: Optional[np.ndarray] = None, block_rows: int = BLOCK_ROWS):
+    """Top-k cosine search scanning the matrix in fixed-size blocks.
+
+    Each block keeps only its local top-k, which is merged into a global k-sized
+    min-heap, so peak memory is O(block_rows + k) whatever the corpus size. Rows
+    where `mask` is False are skipped. Returns (indices, scores), best first.
+    """
+    query = l2_normalize(query)
+    heap = []  # (score, row) min-heap holding the best k seen so far
+    for start in range(0, len(normalized_matrix), block_rows):
+        block_scores = normalized_matrix[start:start + block_rows] @ query
+        if mask is not None:
+            block_scores[~mask[start:start + len(block_scores)]] = -np.inf
+        for i in top_k(block_scores, k):
+            score = float(block_scores[i])
+            if score == -np.inf:
+                break
+            item = (score, start + int(i))
+            if len(heap) < k:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+            else:
+                break  # the rest of this block is lower still
+    heap.sort(reverse=True)
+    return (np.array([row for _, row in heap], dtype=np.int64),
+            np.array([score for score, _ in heap], dtype=np.float32))
+
+
+def _row_top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Column indices of the `k` highest scores in every row (unordered)."""
+    if scores.shape[1] <= k:
+        return np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    return np.argpartition(scores, scores.shape[1] - k, axis=1)[:, -k:]
+
+
+def blocked_top_k_many(normalized_matrix: np.ndarray, queries: np.ndarray, k: int,
+                       mask: Optional[np.ndarray] = None, block_rows: int = BLOCK_ROWS // 16,
+                       query_block: int = 256):
+    """blocked_top_k for many queries at once, scoring each block with one matrix-matrix product.
+
+    Scratch memory is O(query_block * block_rows). Returns one (indices, scores)
+    pair per query, best first, like blocked_top_k.
+    """
+    queries = l2_normalize(np.atleast_2d(queries))
+    results = []
+    for q_start in range(0, len(queries), query_block):
+        q = queries[q_start:q_start + query_block]
+        best_scores = np.full((len(q), 0), -np.inf, dtype=np.float32)
+        best_rows = np.empty((len(q), 0), dtype=np.int64)
+        for start in range(0, len(normalized_matrix), block_rows):
+            block_scores = q @ np.asarray(normalized_matrix[start:start + block_rows]).T
+            if mask is not None:
+                block_scores[:, ~mask[start:start + block_scores.shape[1]]] = -np.inf
+            local = _row_top_k(block_scores, k)
+            scores = np.concatenate([best_scores, np.take_along_axis(block_scores, local, axis=1)], axis=1)
+            rows = np.concatenate([best_rows, local + start], axis=1)
+            keep = _row_top_k(scores, k)
+            best_scores = np.take_along_axis(scores, keep, axis=1)
+            best_rows = np.take_along_axis(rows, keep, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        for rows, scores in zip(best_rows, best_scores):
+            found = scores > -np.inf
+            results.append((rows[found], scores[found]))
+    return results
+
+
+def gathered_top_k(normalized_matrix: np.ndarray, rows: np.ndarray, query: np.ndarray, k: int,
+                   block_rows: int = BLOCK_ROWS):
+    """Top-k cosine search restricted to the given candidate `rows` (sorted, for sequential reads).
+
+    Only the candidates are read and scored, so the cost is O(len(rows)) instead
+    of a scan over the whole matrix. Returns (indices, scores), best first.
+    """
+    query = l2_normalize(query)
+    best_rows = np.empty(0, dtype=np.int64)
+    best_scores = np.empty(0, dtype=np.float32)
+    for start in range(0, len(rows), block_rows):
+        block = rows[start:start + block_rows]
+        scores = np.concatenate([best_scores, np.asarray(normalized_matrix[block]) @ query])
+        candidates = np.concatenate([best_rows, block])
+        keep = top_k(scores, k)
+        best_rows, best_scores = candidates[keep], scores[keep]
+    return best_rows.astype(np.int64), best_scores.astype(np.float32)
+
+
+def reciprocal_rank_fusion(rankings, k: int, rrf_k: int = 60):
+    """Fuse several rankings (arrays of row ids, best first) by sum of 1 / (rrf_k + rank).
+
+    Returns (indices, fused scores) of the top `k` rows, best first.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking.tolist(), 1):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (rrf_k + rank)
+    best = sorted(fused.items(), key=lambda item: -item[1])[:k]
+    return (np.array([row for row, _ in best], dtype=np.int64),
+            np.array([score for _, score in best], dtype=np.float32))
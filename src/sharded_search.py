@@ -0,0 +1,120 @@
+# python src/sharded_search.py
+
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+if multiprocessing.parent_process() is not None:
+    # Shard workers: one BLAS thread each, the pool provides the parallelism.
+    # Must be set before NumPy is imported in the worker.
+    for _var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(_var, "1")
+
+import numpy as np
+
+from src.embedding_store import map_vectors
+from src.retrieval import blocked_top_k, blocked_top_k_many, l2_normalize, top_k
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Worker side
+# ---------------------------
+_mapped = {}  # vectors path -> memmap, per worker process
+
+
+class StaleVectorsError(RuntimeError):
+    """The vector file a query's snapshot reads no longer exists (or is shorter), e.g. after a compaction."""
+
+
+def _shard_vectors(vectors_path: str, dim: int, stop: int) -> np.ndarray:
+    """The worker's read-only mapping of the store, remapped when it has grown past `stop` rows."""
+    vectors = _mapped.get(vectors_path)
+    if vectors is None or len(vectors) < stop:
+        _mapped.clear()  # older generations are not searched again
+        vectors = map_vectors(vectors_path, dim, stop)
+        if len(vectors) < stop:
+            raise StaleVectorsError(f"{vectors_path} has {len(vectors)} of {stop} rows")
+        _mapped[vectors_path] = vectors
+    return vectors
+
+
+def _search_shard(vectors_path: str, dim: int, start: int, stop: int, queries: np.ndarray, k: int,
+                  packed_mask: Optional[np.ndarray]):
+    """Top-k over rows [start, stop) of the vector store for each query. Returns global (indices, scores) pairs."""
+    vectors = _shard_vectors(vectors_path, dim, stop)[start:stop]
+    mask = None
+    if packed_mask is not None:
+        mask = np.unpackbits(packed_mask, count=stop - start).astype(bool)
+    if len(queries) == 1:
+        hits = [blocked_top_k(vectors, queries[0], k, mask=mask)]
+    else:
+        hits = blocked_top_k_many(vectors, queries, k, mask=mask)
+    return [(indices + start, scores) for indices, scores in hits]
+
+
+# ---------------------------
+# Engine side
+# ---------------------------
+class ShardedSearcher:
+    """Exact top-k split across a pool of worker processes.
+
+    Each worker memory-maps the same float32 vector file the engine reads, so
+    the matrix is shared through the page cache and never copied or pickled;
+    a query only sends its vector and the liveness/filter mask packed to one
+    bit per row. Every shard returns its local top-k and the engine merges
+    them. The calling thread just waits on the futures, so the event loop of
+    the API worker stays free while the shards run on other cores.
+
+    Workers open the file by path, so a query on a snapshot whose generation
+    was compacted away meanwhile is answered by the in-process scan instead.
+    """
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that runs threads (uvicorn, Streamlit, the refresh timer) is unsafe
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+            logger.info(f"Started {self.workers} retrieval shard workers")
+        return self._pool
+
+    def search(self, vectors: np.memmap, query: np.ndarray, k: int, mask: Optional[np.ndarray] = None):
+        """Top-k cosine search over `vectors` (a memmap of the store). Returns (indices, scores), best first."""
+        return self.search_many(vectors, np.asarray(query)[None, :], k, mask=mask)[0]
+
+    def search_many(self, vectors: np.memmap, queries: np.ndarray, k: int, mask: Optional[np.ndarray] = None):
+        """search for several queries, one matrix-matrix product per block in each shard."""
+        rows, dim = vectors.shape
+        queries = l2_normalize(queries)
+        pool = self._get_pool()
+        bounds = np.linspace(0, rows, self.workers + 1).astype(np.int64)
+        futures = []
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            if stop <= start:
+                continue
+            packed_mask = None if mask is None else np.packbits(mask[start:stop])
+            futures.append(pool.submit(_search_shard, vectors.filename, dim, int(start), int(stop), queries, k,
+                                       packed_mask))
+        try:
+            shard_hits = [future.result() for future in futures]
+        except StaleVectorsError as e:
+            # A compaction unlinked the snapshot's file; the engine's own mapping still reads it
+            logger.warning(f"Shard workers cannot read this snapshot, searching in process: {e}")
+            return blocked_top_k_many(vectors, queries, k, mask=mask)
+        results = []
+        for q in range(len(queries)):
+            indices = np.concatenate([hits[q][0] for hits in shard_hits])
+            scores = np.concatenate([hits[q][1] for hits in shard_hits])
+            best = top_k(scores, k)
+            results.append((indices[best], scores[best]))
+        return results
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
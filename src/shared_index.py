@@ -0,0 +1,152 @@
+# python src/shared_index.py
+
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+from src.embedding_store import (INDEX_MANIFEST_PATH, RECORD_OFFSET_DTYPE, manifest_file, map_vectors,
+                                 read_manifest, same_generation)
+from src.index_tail import INT_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+
+def _map(path: str, dtype, shape: tuple) -> np.ndarray:
+    """Read-only mapping of the start of `path` (an empty array for an empty shape)."""
+    if int(np.prod(shape)) == 0:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+
+class MappedRecordStore:
+    """Read-only RecordStore over the record files of one index snapshot.
+
+    Values are decoded from the mapped file when read, so the ticket texts sit
+    once in the page cache for all processes instead of once per process.
+    """
+    def __init__(self, columns: List[str], offsets: np.ndarray, blob: np.ndarray):
+        self._names = list(columns)
+        self._columns = {name: i for i, name in enumerate(columns)}
+        self._offsets = offsets  # (rows, columns) end offset of every value in blob
+        self._blob = blob
+        self.rows = len(offsets)
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._names)
+
+    def _value(self, row: int, col: int):
+        if col:
+            start = self._offsets[row, col - 1]
+        else:
+            start = self._offsets[row - 1, -1] if row else 0
+        value = bytes(self._blob[start:self._offsets[row, col]]).decode("utf-8")
+        return int(value) if self._names[col] in INT_COLUMNS else value
+
+    def get(self, row: int, name: str, default=None):
+        col = self._columns.get(name)
+        if col is None:
+            return default
+        return self._value(row, col)
+
+    def record(self, row: int) -> dict:
+        """All fields of one row as a new dict."""
+        return {name: self._value(row, col) for col, name in enumerate(self._names)}
+
+
+class LiveTickets:
+    """ticket_id -> live row view: the newest first-chunk row of each ticket, if it is alive in the snapshot."""
+    def __init__(self, newest: dict, alive: np.ndarray):
+        self._newest = newest
+        self._alive = alive
+        # Live tickets, not live rows: a ticket's later chunks are alive too but not counted, as in IndexTail
+        rows = np.fromiter(newest.values(), dtype=np.int64, count=len(newest))
+        rows = rows[rows < len(alive)]
+        self._count = int(np.count_nonzero(alive[rows]))
+
+    def __len__(self):
+        return self._count
+
+    def get(self, ticket_id: str, default=None):
+        row = self._newest.get(ticket_id)
+        if row is None or row >= len(self._alive) or not self._alive[row]:
+            return default
+        return row
+
+
+class SharedIndexReader:
+    """Attaches to the index snapshots published by EmbeddingStoreWriter.
+
+    Same interface as IndexTail, but nothing is parsed into process memory:
+    vectors, record fields and the liveness mask are read-only mappings of
+    the snapshot files, shared through the page cache by every process that
+    serves the index (uvicorn workers, the Streamlit UI). `poll` moves to the
+    newest published version in one step, so rows, fields and liveness always
+    come from the same version. A version is never modified after it is
+    published, and a mapping stays valid after the writer unlinks its files.
+    """
+    def __init__(self, manifest_path: str = INDEX_MANIFEST_PATH):
+        self.manifest_path = manifest_path
+        self.reset()
+
+    def reset(self):
+        self.manifest = None
+        self.version = None
+        self.rows = 0
+        self.records = None  # MappedRecordStore of the attached version
+        self._alive = np.zeros(0, dtype=bool)
+        self._newest = {}  # ticket_id -> newest row holding its first chunk
+        self.live = LiveTickets(self._newest, self._alive)
+
+    def needs_reset(self) -> bool:
+        """True if the pipeline restarted or compacted the output into a new generation."""
+        if self.manifest is None:
+            return False
+        return not same_generation(read_manifest(self.manifest_path), self.manifest)
+
+    def poll(self) -> List[dict]:
+        """Attach to the newest snapshot version; return the records of the rows it added."""
+        manifest = read_manifest(self.manifest_path)
+        if manifest is None or "version" not in manifest:
+            return []
+        if self.manifest is not None and (not same_generation(manifest, self.manifest)
+                                          or manifest["version"] == self.version):
+            return []
+        try:
+            records, alive = self._attach(manifest)
+        except FileNotFoundError:
+            # Replaced again while attaching; the next poll picks up the newer version
+            logger.debug(f"Index snapshot {manifest['version']} disappeared while attaching")
+            return []
+        new_records = [records.record(row) for row in range(self.rows, len(records))]
+        for row, record in enumerate(new_records, self.rows):
+            if not record.get("chunk_no"):
+                self._newest[record["ticket_id"]] = row
+        self.manifest, self.version, self.rows = manifest, manifest["version"], len(records)
+        self.records, self._alive = records, alive
+        self.live = LiveTickets(self._newest, alive)
+        return new_records
+
+    def _attach(self, manifest: dict):
+        rows, columns = manifest["rows"], manifest["record_columns"]
+        offsets = _map(manifest_file(manifest, "offsets", self.manifest_path), RECORD_OFFSET_DTYPE,
+                       (rows, len(columns)))
+        blob = _map(manifest_file(manifest, "records", self.manifest_path), np.uint8,
+                    (int(offsets[-1, -1]) if rows else 0,))
+        alive = _map(manifest_file(manifest, "alive", self.manifest_path), bool, (rows,))
+        return MappedRecordStore(columns, offsets, blob), alive
+
+    def alive(self) -> np.ndarray:
+        """Boolean mask over the visible rows, False for retracted or superseded rows."""
+        return self._alive
+
+    def vectors(self) -> Optional[np.ndarray]:
+        """Memory-mapped matrix covering exactly the visible rows."""
+        if self.manifest is None:
+            return None
+        return map_vectors(manifest_file(self.manifest, "vectors", self.manifest_path),
+                           self.manifest["dim"], self.rows)
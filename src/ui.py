@@ -103,7 +103,9 @@ for message in st.session_state.messages:
                 for i, source in enumerate(message["sources"]):
                     st.markdown(f"**Source {i+1}:**")
                     st.caption(f"ID: `{source.get('id', 'N/A')}`")
-                    st.caption(f"Relevance Score: `{source.get('score', 'N/A'):.4f}`")
+                    st.caption(f"Similarity: `{source.get('score', 'N/A'):.4f}`")
+                    if source.get('rank_score') is not None:
+                        st.caption(f"Rank Score (hybrid): `{source['rank_score']:.4f}`")
                     
                     with st.container():
                         st.json(source.get('metadata', {}))
@@ -124,23 +126,29 @@ if prompt := st.chat_input("Ask a question about the indexed data..."):
             sources_data = []
             
             try:
+                logger.info(f"Sending query to chat engine: {prompt}")
+                start_time = time.time()
                 with st.spinner("🧠 Thinking..."):
-                    logger.info(f"Sending query to chat engine: {prompt}")
-                    start_time = time.time()
-                    response = chat_engine.chat(prompt)
-                    query_time = time.time() - start_time
-                    
-                    full_response_content = str(response.response)
-                    logger.info(f"Query processed in {query_time:.2f} seconds")
+                    query_emb = chat_engine.encode_query(prompt)
+                    source_nodes = chat_engine.retrieve_sources(prompt, query_emb=query_emb)
+                sources_data = [
+                    {
+                        "id": node.node_id,
+                        "metadata": node.metadata or {},
+                        "score": node.score,
+                        "rank_score": node.rank_score
+                    } for node in source_nodes
+                ]
 
-                    if hasattr(response, 'source_nodes'):
-                        sources_data = [
-                            {
-                                "id": node.node_id,
-                                "metadata": node.metadata or {},
-                                "score": node.score
-                            } for node in response.source_nodes
-                        ]
+                # Render the answer as the model streams it instead of waiting for the full completion
+                first_token_time = None
+                for text in chat_engine.stream_answer(prompt, source_nodes, query_emb):
+                    if first_token_time is None:
+                        first_token_time = time.time() - start_time
+                    full_response_content += text
+                    message_placeholder.markdown(full_response_content + "▌")
+                query_time = time.time() - start_time
+                logger.info(f"Query processed in {query_time:.2f} seconds (first token after {first_token_time or 0:.2f}s)")
 
                 message_placeholder.markdown(full_response_content)
                 
@@ -149,7 +157,9 @@ if prompt := st.chat_input("Ask a question about the indexed data..."):
                         for i, source in enumerate(sources_data):
                             st.markdown(f"**Source {i+1}:**")
                             st.caption(f"ID: `{source.get('id', 'N/A')}`")
-                            st.caption(f"Relevance Score: `{source.get('score', 'N/A'):.4f}`")
+                            st.caption(f"Similarity: `{source.get('score', 'N/A'):.4f}`")
+                            if source.get('rank_score') is not None:
+                                st.caption(f"Rank Score (hybrid): `{source['rank_score']:.4f}`")
                             
                             with st.container():
                                 st.json(source.get('metadata', {}))
@@ -247,6 +257,7 @@ with st.sidebar:
             logger.error(f"Error scanning input directory: {e}", exc_info=True)
     
     # <-- THIS ENTIRE BUTTON LOGIC BLOCK IS THE FIX -->
+    st.caption("New tickets become searchable automatically as the pipeline indexes them.")
     if st.button("🔄 Reload RAG Index"):
         try:
             with st.spinner("Reloading knowledge base..."):
@@ -7,7 +7,8 @@ PW_PID=$!
 echo "Pathway Pipeline PID: $PW_PID"
 
 echo "Starting FastAPI Server..."
-uvicorn src.api:app --host 0.0.0.0 --port 8000 &
+# Workers map the same index snapshots, so extra workers cost their model and search indexes, not the index
+uvicorn src.api:app --host 0.0.0.0 --port 8000 --workers "${API_WORKERS:-1}" &
 API_PID=$!
 echo "FastAPI Server PID: $API_PID"
 
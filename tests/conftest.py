@@ -0,0 +1,41 @@
+# python -m pytest tests
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The engine reads its configuration when src.rag is imported: point it at a scratch output directory
+os.environ.setdefault("OUTPUT_DATA_DIR", tempfile.mkdtemp(prefix="rag-test-output-"))
+os.environ.setdefault("OPENAI_API_KEY", "test")  # never called: the tests only retrieve
+os.environ.setdefault("INDEX_REFRESH_SECONDS", "0")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src import rag  # noqa: E402
+from src.embedding_store import INDEX_MANIFEST_PATH, METADATA_COLUMNS, EmbeddingStoreWriter  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def model():
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(rag.EMBEDDING_MODEL_NAME)
+
+
+@pytest.fixture
+def build_engine(model):
+    """build_engine(rows) writes `rows` (dicts of the METADATA_COLUMNS) as a fresh index and returns a ChatEngine on it."""
+    def build(rows):
+        writer = EmbeddingStoreWriter(model.get_sentence_embedding_dimension(), INDEX_MANIFEST_PATH)
+        embeddings = model.encode([row["body"] for row in rows], convert_to_numpy=True)
+        for i, (row, embedding) in enumerate(zip(rows, embeddings)):
+            record = {column: row.get(column, "") for column in METADATA_COLUMNS}
+            record["chunk_no"] = row.get("chunk_no", 0)
+            writer.on_change(f"key-{i}", dict(record, embedding=embedding), time=2, is_addition=True)
+        writer.on_time_end(2)
+        writer.on_end()
+        return rag.ChatEngine()
+
+    return build
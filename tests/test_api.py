@@ -0,0 +1,54 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from src import rag
+from src.api import app
+
+SHORT_TICKETS, LONG_TICKETS = 150, 5
+
+
+def paged_corpus():
+    """Short tickets and a few long, multi-chunk ones that all match the query to some degree."""
+    rows = []
+    for i in range(SHORT_TICKETS):
+        rows.append(dict(ticket_id=f"TKT-{i}", timestamp=f"2024-01-{i % 28 + 1:02d}", customer_id=f"C{i % 3}",
+                         subject="Printer", body=f"printer jam in tray {i}" + " again" * (i % 7)))
+    for i in range(LONG_TICKETS):
+        rows += [dict(ticket_id=f"DOC-{i}", timestamp="2024-02-01", subject="Manual",
+                      body=f"printer manual section {i}.{chunk_no}", chunk_no=chunk_no) for chunk_no in range(12)]
+    return rows
+
+
+def page_through(client: TestClient, query: str, page_size: int, **params):
+    """Ticket ids of all /search pages for `query`, requested until a short page."""
+    ids, offset = [], 0
+    while True:
+        response = client.get("/search", params=dict(params, q=query, top_k=page_size, offset=offset))
+        assert response.status_code == 200
+        page = response.json()["results"]
+        ids += [result["id"] for result in page]
+        if len(page) < page_size:
+            return ids
+        offset += page_size
+
+
+@pytest.mark.parametrize("query", ["printer jam", "tray 3 jam"])
+@pytest.mark.parametrize("mode", ["vector", "hybrid"])
+def test_search_pages_have_no_gaps_or_duplicates(build_engine, monkeypatch, mode, query):
+    monkeypatch.setattr(rag, "RETRIEVAL_MODE", mode)
+    monkeypatch.setattr(rag, "_chat_engine_instance", build_engine(paged_corpus()))
+    client = TestClient(app)
+
+    small_pages = page_through(client, query, 4)
+    assert len(small_pages) == len(set(small_pages)) == SHORT_TICKETS + LONG_TICKETS
+    # The page size must not change the ranking the pages are cut from
+    assert small_pages == page_through(client, query, 100)
+
+
+def test_search_pages_with_filters(build_engine, monkeypatch):
+    monkeypatch.setattr(rag, "_chat_engine_instance", build_engine(paged_corpus()))
+    client = TestClient(app)
+
+    ids = page_through(client, "printer jam", 3, customer_id="C1")
+    assert len(ids) == len(set(ids)) == SHORT_TICKETS // 3
+    assert all(int(ticket_id.split("-")[1]) % 3 == 1 for ticket_id in ids)
@@ -0,0 +1,42 @@
+import pytest
+
+from src import rag
+
+QUERY = "lorem ipsum dolor sit amet"
+
+
+def long_ticket_corpus(chunks: int):
+    """One ticket whose every chunk is the query text, and short tickets that only resemble it."""
+    rows = [dict(ticket_id="LONG", timestamp="2024-01-01", subject="Long", body=QUERY, chunk_no=i)
+            for i in range(chunks)]
+    rows += [dict(ticket_id=f"SHORT-{i}", timestamp="2024-01-02", subject="Short", body=f"{QUERY} note {i}")
+             for i in range(12)]
+    return rows
+
+
+@pytest.mark.parametrize("reader", ["snapshot", "tail"])
+@pytest.mark.parametrize("mode", ["vector", "hybrid"])
+def test_long_ticket_does_not_crowd_out_top_k(build_engine, monkeypatch, mode, reader):
+    monkeypatch.setattr(rag, "RETRIEVAL_MODE", mode)
+    monkeypatch.setattr(rag, "INDEX_READER", reader)
+    top_k = 5
+    # More chunks of one ticket than the first candidate depth holds
+    engine = build_engine(long_ticket_corpus(top_k * rag.CHUNK_CANDIDATES * 2))
+
+    sources = engine.retrieve_sources(QUERY, top_k=top_k)
+    ids = [source.node_id for source in sources]
+    assert len(ids) == top_k
+    assert len(set(ids)) == top_k
+    assert ids[0] == "LONG"
+
+    _, batch = engine.retrieve_sources_batch([QUERY, "note 3"], top_k=top_k)
+    for sources in batch:
+        ids = [source.node_id for source in sources]
+        assert len(ids) == top_k and len(set(ids)) == top_k
+
+
+def test_fewer_tickets_than_top_k_returns_them_all(build_engine, monkeypatch):
+    monkeypatch.setattr(rag, "RETRIEVAL_MODE", "vector")
+    engine = build_engine(long_ticket_corpus(40)[:43])  # LONG and 3 short tickets
+    ids = [source.node_id for source in engine.retrieve_sources(QUERY, top_k=10)]
+    assert sorted(ids) == ["LONG", "SHORT-0", "SHORT-1", "SHORT-2"]